@@ -0,0 +1,408 @@
+"""
+Vectorised reprojection and measurement of WKB geometries.
+
+This module does not import qgis so it can also run in worker processes.
+It depends on NumPy and pyproj; when either is missing HAS_BATCH_SUPPORT
+is False and callers must use the QgsGeometry path instead.
+"""
+import struct
+import warnings
+
+try:
+    import numpy as np
+    from pyproj import CRS, Transformer
+    from pyproj.exceptions import CRSError
+    HAS_BATCH_SUPPORT = True
+except ImportError:
+    np = None
+    CRS = None
+    Transformer = None
+    CRSError = None
+    HAS_BATCH_SUPPORT = False
+
+# Tipos WKB suportados (os demais, como curvas, voltam ao caminho do QGIS)
+WKB_POINT = 1
+WKB_LINESTRING = 2
+WKB_POLYGON = 3
+WKB_MULTIPOINT = 4
+WKB_MULTILINESTRING = 5
+WKB_MULTIPOLYGON = 6
+WKB_GEOMETRYCOLLECTION = 7
+
+# Regras de escolha do CRS (as mesmas de select_crs)
+CONIC_CRS = 'ESRI:54034'
+CONIC_THRESHOLD = 5.9
+
+
+class UnsupportedGeometry(Exception):
+    """Raised when a WKB blob contains types the batch path cannot handle"""
+
+
+def parse_wkb(wkb):
+    """
+    Split a WKB blob into coordinate arrays
+    Returns a list of (xy array, area sign) tuples, one per ring or linestring:
+    1 for exterior rings, -1 for holes and 0 for linestrings
+    """
+    rings = []
+    _read_geometry(memoryview(wkb), 0, rings)
+    return rings
+
+
+def _read_header(buf, pos):
+    byte_order = '<' if buf[pos] == 1 else '>'
+    wkb_type = struct.unpack_from(byte_order + 'I', buf, pos + 1)[0]
+
+    # EWKB usa flags nos bits altos; ISO WKB soma 1000/2000/3000
+    has_z = bool(wkb_type & 0x80000000)
+    has_m = bool(wkb_type & 0x40000000)
+    has_srid = bool(wkb_type & 0x20000000)
+    wkb_type &= 0x0FFFFFFF
+    if wkb_type >= 1000:
+        dims, wkb_type = divmod(wkb_type, 1000)
+        has_z = has_z or dims in (1, 3)
+        has_m = has_m or dims in (2, 3)
+
+    pos += 5
+    if has_srid:
+        pos += 4
+    return byte_order, wkb_type, 2 + has_z + has_m, pos
+
+
+def _read_points(buf, pos, byte_order, dim):
+    count = struct.unpack_from(byte_order + 'I', buf, pos)[0]
+    pos += 4
+    coords = np.frombuffer(buf, dtype=byte_order + 'f8', count=count * dim, offset=pos)
+    return coords.reshape(count, dim)[:, :2], pos + count * dim * 8
+
+
+def _read_geometry(buf, pos, rings):
+    byte_order, wkb_type, dim, pos = _read_header(buf, pos)
+
+    if wkb_type == WKB_POINT:
+        return pos + dim * 8
+
+    if wkb_type == WKB_LINESTRING:
+        coords, pos = _read_points(buf, pos, byte_order, dim)
+        rings.append((coords, 0))
+        return pos
+
+    if wkb_type == WKB_POLYGON:
+        count = struct.unpack_from(byte_order + 'I', buf, pos)[0]
+        pos += 4
+        for i in range(count):
+            coords, pos = _read_points(buf, pos, byte_order, dim)
+            rings.append((coords, -1 if i > 0 else 1))
+        return pos
+
+    if wkb_type in (WKB_MULTIPOINT, WKB_MULTILINESTRING, WKB_MULTIPOLYGON, WKB_GEOMETRYCOLLECTION):
+        count = struct.unpack_from(byte_order + 'I', buf, pos)[0]
+        pos += 4
+        for _ in range(count):
+            pos = _read_geometry(buf, pos, rings)
+        return pos
+
+    raise UnsupportedGeometry(wkb_type)
+
+
+def target_crs(centroid_lon, centroid_lat, bbox_width):
+    """
+    Authid of the CRS used to measure a feature: the UTM zone of its centroid,
+    or the Polyconic projection when it is wider than CONIC_THRESHOLD degrees
+    """
+    if bbox_width > CONIC_THRESHOLD:
+        return CONIC_CRS
+    utm_zone = int((centroid_lon + 180) // 6) + 1
+    epsg = 32600 + utm_zone if centroid_lat >= 0 else 32700 + utm_zone
+    return f'EPSG:{epsg}'
+
+
+def bbox_target_crs(xmin, ymin, xmax, ymax):
+    """
+    Target CRS decided from the geographic bounding box alone, or None when
+    the box straddles a zone border or the equator and the centroid is needed
+    """
+    width = xmax - xmin
+    if width > CONIC_THRESHOLD:
+        return CONIC_CRS
+    # O centroide fica dentro da caixa: se os dois cantos caem no mesmo fuso, ele também
+    west = target_crs(xmin, ymin, width)
+    return west if west == target_crs(xmax, ymax, width) else None
+
+
+def pyproj_definition(authid, wkt):
+    """
+    Source CRS definition pyproj accepts: the authid, or the WKT when PROJ does
+    not know the authority (QGIS user CRSs are USER:100000...); None when neither parses
+    """
+    for definition in (authid, wkt):
+        if not definition:
+            continue
+        try:
+            CRS.from_user_input(definition)
+            return definition
+        except CRSError:
+            pass
+    return None
+
+
+def equivalent_target(proj_definition):
+    """
+    Target CRS authid that measures the same as a PROJ definition, or None
+    UTM on GRS80 (SIRGAS 2000, ...) counts as the WGS 84 zone: the ellipsoids
+    differ by a tenth of a millimetre in the semi-minor axis
+    """
+    params = {}
+    for token in proj_definition.split():
+        key, _, value = token.lstrip('+').partition('=')
+        params[key] = value
+
+    if params.get('proj') != 'utm' or not params.get('zone', '').isdigit():
+        return None
+    if params.get('ellps') not in ('GRS80', 'WGS84') and params.get('datum') != 'WGS84':
+        return None
+    if params.get('units', 'm') != 'm' or any(float(v) for v in params.get('towgs84', '0').split(',')):
+        return None
+    return f"EPSG:{(32700 if 'south' in params else 32600) + int(params['zone'])}"
+
+
+class BatchMeasurer:
+    """Reprojects and measures many WKB geometries per target CRS at once"""
+
+    # Mesmo número de pontos por lado usado por QgsCoordinateTransform.transformBoundingBox
+    DENSIFY_POINTS = 21
+
+    def __init__(self):
+        self.transformers = {}
+        self.native_targets = {}
+
+    def transformer(self, src_def, dest_def):
+        key = (src_def, dest_def)
+        transformer = self.transformers.get(key)
+        if transformer is None:
+            transformer = Transformer.from_crs(src_def, dest_def, always_xy=True)
+            self.transformers[key] = transformer
+        return transformer
+
+    def native_target(self, src_def):
+        """Target CRS authid equivalent to src_def, measured without reprojecting"""
+        if src_def not in self.native_targets:
+            if src_def == CONIC_CRS:
+                self.native_targets[src_def] = CONIC_CRS
+            else:
+                with warnings.catch_warnings():
+                    # A conversão para PROJ avisa que perde informação; só os parâmetros UTM interessam
+                    warnings.simplefilter('ignore', UserWarning)
+                    proj = CRS.from_user_input(src_def).to_proj4()
+                self.native_targets[src_def] = equivalent_target(proj)
+        return self.native_targets[src_def]
+
+    def measure(self, src_def, dest_def, wkbs):
+        """
+        Measure WKB geometries after reprojecting them from src_def to dest_def
+        Returns (area_m2, length_m, supported) arrays aligned with wkbs; entries
+        whose supported flag is False must be measured by the caller
+        """
+        parsed = [self.parse(wkb) for wkb in wkbs]
+        area, length = self.measure_parsed(src_def, dest_def, parsed)
+        supported = np.fromiter((rings is not None for rings in parsed), dtype=bool, count=len(parsed))
+        return area, length, supported
+
+    def measure_auto(self, src_def, wkbs):
+        """
+        Choose the target CRS of each WKB geometry with the select_crs rules and measure it
+        Returns (area_m2, length_m, targets); a None target marks a geometry the
+        caller must measure itself
+        """
+        parsed = [self.parse(wkb) for wkb in wkbs]
+        targets = self.select_targets(src_def, parsed)
+        area = np.zeros(len(wkbs))
+        length = np.zeros(len(wkbs))
+
+        groups = {}
+        for idx, authid in enumerate(targets):
+            if authid is not None:
+                groups.setdefault(authid, []).append(idx)
+
+        native = self.native_target(src_def)
+        for authid, indexes in groups.items():
+            dest_def = src_def if authid == native else authid
+            group_area, group_length = self.measure_parsed(src_def, dest_def, [parsed[idx] for idx in indexes])
+            area[indexes] = group_area
+            length[indexes] = group_length
+
+        return area, length, targets
+
+    @staticmethod
+    def parse(wkb):
+        try:
+            return parse_wkb(wkb)
+        except (UnsupportedGeometry, struct.error, ValueError, IndexError):
+            # IndexError: WKB vazio (geometria nula)
+            return None
+
+    @staticmethod
+    def concatenate(parsed):
+        """
+        Flatten the rings of several parsed geometries
+        Returns (x, y, sizes, owners, signs) or None when there is nothing to measure
+        """
+        parts = []
+        owners = []
+        signs = []
+        for idx, rings in enumerate(parsed):
+            if rings is None:
+                continue
+            for coords, sign in rings:
+                if len(coords) < 2:
+                    continue
+                parts.append(coords)
+                owners.append(idx)
+                signs.append(sign)
+
+        if not parts:
+            return None
+
+        coords = np.concatenate(parts)
+        sizes = np.fromiter((len(part) for part in parts), dtype=np.int64, count=len(parts))
+        return (
+            np.ascontiguousarray(coords[:, 0]),
+            np.ascontiguousarray(coords[:, 1]),
+            sizes,
+            np.asarray(owners, dtype=np.int64),
+            np.asarray(signs, dtype=float)
+        )
+
+    def measure_parsed(self, src_def, dest_def, parsed):
+        count = len(parsed)
+        area = np.zeros(count)
+        length = np.zeros(count)
+
+        batch = self.concatenate(parsed)
+        if batch is None:
+            return area, length
+
+        x, y, sizes, owners, signs = batch
+        if dest_def != src_def:
+            x, y = self.transformer(src_def, dest_def).transform(x, y)
+        rings = self.ring_measures(np.asarray(x, dtype=float), np.asarray(y, dtype=float), sizes)
+
+        area += np.bincount(owners, weights=signs * np.abs(rings['cross']) / 2.0, minlength=count)
+        length += np.bincount(owners, weights=rings['length'], minlength=count)
+        return area, length
+
+    def select_targets(self, src_def, parsed):
+        """Target CRS authid of each parsed geometry, following select_crs"""
+        count = len(parsed)
+        targets = [None] * count
+
+        batch = self.concatenate(parsed)
+        if batch is None:
+            return targets
+
+        x, y, sizes, owners, signs = batch
+        rings = self.ring_measures(x, y, sizes, moments=True)
+
+        def per_feature(values):
+            return np.bincount(owners, weights=values, minlength=count)
+
+        # Centroide ponderado como no GEOS: por área, senão por comprimento, senão pelos vértices
+        cross = rings['cross']
+        safe_cross = np.where(cross == 0, 1.0, cross)
+        ring_area = np.where(cross == 0, 0.0, signs * np.abs(cross) / 2.0)
+        area_w = per_feature(ring_area)
+        area_x = per_feature(ring_area * (rings['x0'] + rings['area_mx'] / (3.0 * safe_cross)))
+        area_y = per_feature(ring_area * (rings['y0'] + rings['area_my'] / (3.0 * safe_cross)))
+
+        length_w = per_feature(rings['length'])
+        length_x = per_feature(rings['length_mx'] + rings['x0'] * rings['length'])
+        length_y = per_feature(rings['length_my'] + rings['y0'] * rings['length'])
+
+        vertices = per_feature(sizes.astype(float))
+        vertex_x = per_feature(rings['sum_x'])
+        vertex_y = per_feature(rings['sum_y'])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cx = np.where(area_w > 0, area_x / area_w,
+                          np.where(length_w > 0, length_x / length_w, vertex_x / vertices))
+            cy = np.where(area_w > 0, area_y / area_w,
+                          np.where(length_w > 0, length_y / length_w, vertex_y / vertices))
+
+        # Extensão de cada feição no CRS de origem
+        xmin = np.full(count, np.inf)
+        ymin = np.full(count, np.inf)
+        xmax = np.full(count, -np.inf)
+        ymax = np.full(count, -np.inf)
+        starts = np.cumsum(sizes) - sizes
+        np.minimum.at(xmin, owners, np.minimum.reduceat(x, starts))
+        np.minimum.at(ymin, owners, np.minimum.reduceat(y, starts))
+        np.maximum.at(xmax, owners, np.maximum.reduceat(x, starts))
+        np.maximum.at(ymax, owners, np.maximum.reduceat(y, starts))
+
+        valid = np.flatnonzero(vertices > 0)
+        to_geo = self.transformer(src_def, 'EPSG:4326')
+        lon, lat = to_geo.transform(cx[valid], cy[valid])
+        width = self.geographic_width(to_geo, xmin[valid], ymin[valid], xmax[valid], ymax[valid])
+
+        for idx, c_lon, c_lat, w in zip(valid, np.asarray(lon), np.asarray(lat), width):
+            if np.isfinite(c_lon) and np.isfinite(c_lat) and np.isfinite(w):
+                targets[idx] = target_crs(float(c_lon), float(c_lat), float(w))
+        return targets
+
+    def geographic_width(self, to_geo, xmin, ymin, xmax, ymax):
+        """Longitude span of each bounding box, densified like transformBoundingBox"""
+        steps = np.linspace(0.0, 1.0, self.DENSIFY_POINTS)
+        xs = xmin[:, None] + steps * (xmax - xmin)[:, None]
+        ys = ymin[:, None] + steps * (ymax - ymin)[:, None]
+        edge_x = np.hstack((xs, xs, np.repeat(xmin[:, None], len(steps), 1), np.repeat(xmax[:, None], len(steps), 1)))
+        edge_y = np.hstack((np.repeat(ymin[:, None], len(steps), 1), np.repeat(ymax[:, None], len(steps), 1), ys, ys))
+
+        lon, _ = to_geo.transform(edge_x.ravel(), edge_y.ravel())
+        lon = np.asarray(lon, dtype=float).reshape(edge_x.shape)
+        lon[~np.isfinite(lon)] = np.nan
+        with np.errstate(invalid='ignore'):
+            return np.nanmax(lon, axis=1) - np.nanmin(lon, axis=1)
+
+    @staticmethod
+    def ring_measures(x, y, sizes, moments=False):
+        """
+        Per-ring sums over the concatenated coordinate arrays: length and twice the
+        signed shoelace area, plus the centroid moments when moments is True
+        """
+        ends = np.cumsum(sizes)
+        starts = ends - sizes
+        last = ends - 1
+
+        # Desloca cada anel para o seu primeiro vértice para preservar a precisão
+        x0 = x[starts]
+        y0 = y[starts]
+        x = x - np.repeat(x0, sizes)
+        y = y - np.repeat(y0, sizes)
+
+        seg = np.hypot(np.diff(x), np.diff(y))
+        cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+
+        # Segmentos entre o fim de um anel e o início do próximo não existem
+        boundaries = ends[:-1] - 1
+        seg[boundaries] = 0.0
+        cross[boundaries] = 0.0
+
+        def ring_sum(values):
+            total = np.concatenate(([0.0], np.cumsum(values)))
+            return total[last] - total[starts]
+
+        rings = {'length': ring_sum(seg), 'cross': ring_sum(cross)}
+        if moments:
+            mid_x = (x[:-1] + x[1:])
+            mid_y = (y[:-1] + y[1:])
+            rings.update({
+                'x0': x0,
+                'y0': y0,
+                'area_mx': ring_sum(mid_x * cross),
+                'area_my': ring_sum(mid_y * cross),
+                'length_mx': ring_sum(mid_x * seg / 2.0),
+                'length_my': ring_sum(mid_y * seg / 2.0),
+                'sum_x': ring_sum(x[:-1]) + x[last] + x0 * sizes,
+                'sum_y': ring_sum(y[:-1]) + y[last] + y0 * sizes
+            })
+        return rings
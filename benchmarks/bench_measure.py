@@ -0,0 +1,341 @@
+"""
+Benchmark suite for the Measure Calculator plugin.
+
+Runs QGIS offscreen on synthetic memory layers and times the same stages the
+dialog runs: calculate_measures (MeasureTask), update_fields (provider
+attributes + BulkAttributeWriter) and create_temp_layer (TempLayerBuilder).
+Each case runs in its own process so the reported peak RSS belongs to it.
+
+    python benchmarks/bench_measure.py --features 1000 100000 1000000
+    python benchmarks/bench_measure.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_measure.py --baseline benchmarks/baseline.json
+
+qgis is only imported inside the case process: the parallel engine spawns
+workers that re-import this module and must not need a QgsApplication.
+"""
+import argparse
+import importlib
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+
+ENGINES = ('qgis', 'vectorized', 'parallel')
+GEOMETRIES = ('polygon', 'line')
+STAGES = ('generate', 'calculate_measures', 'update_fields', 'create_temp_layer')
+
+# Fusos consecutivos a partir do 18 (oeste do Brasil)
+FIRST_ZONE = 18
+LAT_RANGE = (-30.0, -2.0)
+WIDE_DEGREES = (6.5, 9.0)
+SMALL_DEGREES = (0.002, 0.05)
+
+
+def plugin_module(name):
+    return importlib.import_module(f'{PACKAGE}.{name}')
+
+
+def case_key(case):
+    return '{geometry}-{features}f-{vertices}v-{zones}z-{wide}w-{engine}'.format(**case)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, in MB (None when unavailable)"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1048576.0
+        except (ImportError, AttributeError):
+            return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return peak / 1048576.0 if sys.platform == 'darwin' else peak / 1024.0
+
+
+def shape_wkb(case, rng):
+    """WKB of one synthetic feature placed in a random zone of the case"""
+    zone = FIRST_ZONE + rng.randrange(case['zones'])
+    wide = rng.random() < case['wide']
+    width = rng.uniform(*WIDE_DEGREES) if wide else rng.uniform(*SMALL_DEGREES)
+    half = width / 2.0
+
+    if wide:
+        # Centrado na borda do fuso, atravessa pelo menos dois fusos
+        lon = -180.0 + zone * 6.0
+    else:
+        centre = -183.0 + zone * 6.0
+        lon = rng.uniform(centre - 3.0 + half, centre + 3.0 - half)
+    lat = rng.uniform(*LAT_RANGE)
+    n = case['vertices']
+
+    if case['geometry'] == 'polygon':
+        coords = []
+        for i in range(n):
+            angle = 2.0 * math.pi * i / n
+            coords.append(lon + half * math.cos(angle))
+            coords.append(lat + half * 0.5 * math.sin(angle))
+        coords.extend(coords[:2])
+        return struct.pack(f'<BIII{len(coords)}d', 1, 3, 1, n + 1, *coords)
+
+    coords = []
+    for i in range(n):
+        t = i / (n - 1)
+        coords.append(lon - half + width * t)
+        coords.append(lat + half * 0.1 * math.sin(t * 4.0 * math.pi))
+    return struct.pack(f'<BII{len(coords)}d', 1, 2, n, *coords)
+
+
+def build_layer(case):
+    from qgis.core import QgsVectorLayer, QgsFeature, QgsGeometry
+
+    kind = 'Polygon' if case['geometry'] == 'polygon' else 'LineString'
+    layer = QgsVectorLayer(f'{kind}?crs=EPSG:4674&field=name:string(20)', 'benchmark', 'memory')
+    provider = layer.dataProvider()
+    rng = random.Random(case['seed'])
+
+    chunk = []
+    for i in range(case['features']):
+        geom = QgsGeometry()
+        geom.fromWkb(shape_wkb(case, rng))
+        feat = QgsFeature(layer.fields())
+        feat.setGeometry(geom)
+        feat.setAttributes([f'f{i}'])
+        chunk.append(feat)
+        if len(chunk) >= 10000:
+            provider.addFeatures(chunk)
+            chunk = []
+    if chunk:
+        provider.addFeatures(chunk)
+    layer.updateExtents()
+    return layer
+
+
+def configure(case):
+    engine = plugin_module('measure_engine')
+    engine.write_setting('vectorized', case['engine'] != 'qgis')
+    engine.write_setting('parallel_workers', case['workers'] if case['engine'] == 'parallel' else 0)
+    # Sem cache: cada caso mede todas as feições
+    engine.write_setting('cache_size', 0)
+
+
+def run_case(case):
+    """Run one case in this process and return its measurements"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from qgis.core import QgsApplication, QgsField
+    from qgis.PyQt.QtCore import QCoreApplication
+
+    profile = tempfile.mkdtemp(prefix='measure-bench-')
+    app = QgsApplication([], False, profile)
+    # Configurações isoladas, para não alterar as do usuário
+    QCoreApplication.setOrganizationName('MeasureCalculatorBenchmark')
+    QCoreApplication.setApplicationName('MeasureCalculatorBenchmark')
+    app.initQgis()
+
+    main_plugin = plugin_module('main_plugin')
+    measure_engine = plugin_module('measure_engine')
+    configure(case)
+    if case['engine'] == 'parallel':
+        # O limite evita o custo do pool em seleções pequenas; aqui o pool é o que se quer medir
+        main_plugin.MeasureTask.PARALLEL_MIN_FEATURES = 0
+
+    stages = {}
+    start = time.perf_counter()
+    layer = build_layer(case)
+    stages['generate'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    layer.selectAll()
+    task = main_plugin.MeasureTask(layer, 'benchmark')
+    pool = task.use_parallel(len(task.fids))
+    if not task.run():
+        raise RuntimeError(f'MeasureTask failed: {task.exception}')
+    results = task.engine.results
+    stages['calculate_measures'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fields = measure_engine.measure_field_names(results.geom_type)
+    layer.dataProvider().addAttributes([
+        QgsField(name, measure_engine.QVariantDouble, 'double', 20, 4) for name in fields
+    ])
+    layer.updateFields()
+    writer = main_plugin.BulkAttributeWriter(layer)
+    indexes = writer.field_indexes(fields)
+    field_idx = [indexes[name] for name in fields]
+    writer.write(
+        (fid, {idx: round(value, 4) for idx, value in zip(field_idx, measures)})
+        for fid, measures in results.rows()
+    )
+    stages['update_fields'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    builder = main_plugin.TempLayerBuilder(layer, results, ['name'])
+    temp_layer = builder.build('benchmark results')
+    stages['create_temp_layer'] = time.perf_counter() - start
+
+    measured = results.total
+    report = {
+        'case': case,
+        'measured': measured,
+        'temp_features': temp_layer.featureCount(),
+        'utm_crs': len(results.utm),
+        'conic_features': sum(results.conic.values()),
+        'process_pool': pool,
+        'stages': stages,
+        'features_per_second': measured / stages['calculate_measures'] if stages['calculate_measures'] else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    app.exitQgis()
+    return report
+
+
+def spawn_case(case, executable):
+    """Run one case in a child process, so peak RSS is not shared between cases"""
+    proc = subprocess.run(
+        [executable, os.path.abspath(__file__), '--case', json.dumps(case)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f'{case_key(case)} failed:\n{proc.stderr}')
+    # O QGIS pode escrever avisos no stdout; o relatório é a última linha
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def build_cases(args):
+    cases = []
+    for geometry, features, vertices, zones, wide, engine in itertools.product(
+            args.geometry, args.features, args.vertices, args.zones, args.wide, args.engine):
+        cases.append({
+            'geometry': geometry,
+            'features': features,
+            'vertices': vertices,
+            'zones': zones,
+            'wide': wide,
+            'engine': engine,
+            'workers': args.workers,
+            'seed': args.seed,
+        })
+    return cases
+
+
+def compare(reports, baseline, tolerance):
+    """Print each case against the baseline and return the keys that regressed"""
+    regressions = []
+    header = f"{'case':<44} {'feat/s':>12} {'base':>12} {'ratio':>7} {'RSS MB':>8} {'base':>8}"
+    print(header)
+    print('-' * len(header))
+    for key, report in reports.items():
+        base = baseline.get(key, {})
+        fps = report['features_per_second'] or 0.0
+        base_fps = base.get('features_per_second')
+        rss = report['peak_rss_mb']
+        base_rss = base.get('peak_rss_mb')
+
+        ratio = fps / base_fps if base_fps else None
+        flag = ''
+        if ratio is not None and ratio < 1.0 - tolerance:
+            flag = '  SLOWER'
+        if rss and base_rss and rss > base_rss * (1.0 + tolerance):
+            flag += '  MORE MEMORY'
+        if flag:
+            regressions.append(key)
+
+        print(
+            f"{key:<44} {fps:>12.0f} {base_fps or 0:>12.0f} "
+            f"{ratio if ratio is not None else float('nan'):>7.2f} "
+            f"{rss or 0:>8.1f} {base_rss or 0:>8.1f}{flag}"
+        )
+    return regressions
+
+
+def print_stages(reports):
+    header = f"{'case':<44} " + ' '.join(f'{stage:>18}' for stage in STAGES)
+    print(header)
+    print('-' * len(header))
+    for key, report in reports.items():
+        print(f'{key:<44} ' + ' '.join(f"{report['stages'][stage]:>17.3f}s" for stage in STAGES))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--features', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--vertices', type=int, nargs='+', default=[16, 256])
+    parser.add_argument('--zones', type=int, nargs='+', default=[1, 6],
+                        help='number of consecutive UTM zones the features are spread over')
+    parser.add_argument('--wide', type=float, nargs='+', default=[0.0, 0.05],
+                        help='fraction of features wider than the 5.9 degree conic threshold')
+    parser.add_argument('--geometry', choices=GEOMETRIES, nargs='+', default=list(GEOMETRIES))
+    parser.add_argument('--engine', choices=ENGINES, nargs='+', default=['qgis'])
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help='worker processes for the parallel engine')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', help='JSON baseline to compare against')
+    parser.add_argument('--save-baseline', help='write the results as a new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative slowdown or memory growth reported as a regression')
+    parser.add_argument('--python', help='interpreter used for the case processes')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return 0
+
+    executable = args.python or plugin_module('parallel_measure').python_executable()
+    reports = {}
+    for case in build_cases(args):
+        key = case_key(case)
+        print(f'running {key}...', file=sys.stderr)
+        reports[key] = spawn_case(case, executable)
+        if case['engine'] == 'parallel' and not reports[key]['process_pool']:
+            print(
+                f'warning: {key} ran without the process pool (--workers below 2 or NumPy/pyproj missing); '
+                'it times the serial vectorised path',
+                file=sys.stderr
+            )
+
+    print_stages(reports)
+    print()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get('cases', {})
+    regressions = compare(reports, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'machine': {
+                    'platform': platform.platform(),
+                    'python': platform.python_version(),
+                    'cpus': os.cpu_count(),
+                },
+                'cases': reports,
+            }, f, indent=2)
+
+    if regressions:
+        print(f'\n{len(regressions)} case(s) regressed by more than {args.tolerance:.0%}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
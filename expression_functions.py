@@ -0,0 +1,162 @@
+"""
+Expression functions mc_area_ha(), mc_perimeter_km() and mc_length_km().
+
+They measure the current feature with the same UTM/Polyconic rules as the
+dialog, so they can be used in virtual fields, labels and the field
+calculator. Values are computed lazily, only for the features an expression
+is evaluated on, and memoised per layer and fid with a hash of the geometry,
+so an edited geometry is measured again.
+"""
+import threading
+from collections import OrderedDict
+
+from qgis.core import QgsExpression, QgsProject, QgsWkbTypes, qgsfunction
+
+from .measure_engine import read_setting, TransformCache, MeasureEngine, MeasureCache
+
+# Rótulos e campos virtuais reavaliam as mesmas feições a cada redesenho: o memo fica
+# ativo mesmo sem o cache das execuções, e usa o tamanho dele quando configurado
+MEMO_SIZE = 100000
+
+# Camadas fora do projeto (Processing, camadas intermediárias) nunca são removidas dele:
+# só os memos das camadas usadas mais recentemente são mantidos
+MAX_LAYER_MEMOS = 16
+
+GROUP = 'Measure Calculator'
+
+
+class ExpressionMeasurer:
+    """Engines per source CRS sharing one transform cache, and a memo per layer"""
+
+    def __init__(self):
+        # Criado na thread principal; as expressões são avaliadas também nas threads de renderização
+        self.transforms = TransformCache()
+        self.memo_size = read_setting('cache_size', 0) or MEMO_SIZE
+        self.engines = {}
+        self.memos = OrderedDict()
+        self.lock = threading.Lock()
+
+    def engine(self, authid, geom_type):
+        key = (authid, geom_type)
+        with self.lock:
+            engine = self.engines.get(key)
+            if engine is None:
+                engine = MeasureEngine(self.transforms.crs(authid), geom_type, transforms=self.transforms)
+                self.engines[key] = engine
+            return engine
+
+    def memo(self, layer_id):
+        if self.memo_size <= 0:
+            return None
+        with self.lock:
+            memo = self.memos.get(layer_id)
+            if memo is None:
+                memo = MeasureCache(self.memo_size)
+                self.memos[layer_id] = memo
+                while len(self.memos) > MAX_LAYER_MEMOS:
+                    self.memos.popitem(last=False)
+            else:
+                self.memos.move_to_end(layer_id)
+            return memo
+
+    def remove_layers(self, layer_ids):
+        with self.lock:
+            for layer_id in layer_ids:
+                self.memos.pop(layer_id, None)
+
+    def measure(self, feature, context):
+        """(area in m², length in m) of the feature's geometry, or None when it cannot be measured"""
+        if context is None or feature.geometry().isEmpty():
+            return None
+        # O CRS vem do escopo da camada no contexto: vale também para camadas fora do projeto
+        # e não acessa o QgsProject nas threads de renderização
+        authid = context.variable('layer_crs')
+        if not authid:
+            return None
+
+        geom = feature.geometry()
+        engine = self.engine(authid, geom.type())
+        layer_id = context.variable('layer_id')
+        # Geometrias acima do limite de vértices não entram no memo: a chave copiaria o WKB inteiro
+        memo = self.memo(layer_id) if layer_id and not engine.is_large(geom) else None
+        key = memo.geometry_key(bytes(geom.asWkb()), engine.src_key) if memo is not None else None
+        entry = memo.get(feature.id(), key) if memo is not None else None
+        if entry is not None:
+            return entry[0], entry[1]
+
+        # feature.geometry() é uma cópia: transformar não altera a feição
+        area, length, crs = engine.measure_single(geom)
+        if memo is not None:
+            memo.put(feature.id(), key, area, length, crs.authid())
+        return area, length
+
+    def clear(self):
+        with self.lock:
+            self.engines.clear()
+            self.memos.clear()
+
+
+measurer = None
+
+
+def measure_feature(feature, context, geom_type):
+    if measurer is None or not feature.hasGeometry() or feature.geometry().type() != geom_type:
+        return None
+    return measurer.measure(feature, context)
+
+
+@qgsfunction(args='auto', group=GROUP, usesgeometry=True, referenced_columns=[], register=False)
+def mc_area_ha(feature, parent, context):
+    """
+    Area of the current polygon in hectares, measured in the UTM zone of its
+    centroid, or in the Polyconic projection when it is wider than 5.9 degrees.
+    <h4>Example</h4><p>mc_area_ha() &rarr; 12.3456</p>
+    """
+    measures = measure_feature(feature, context, QgsWkbTypes.PolygonGeometry)
+    return round(measures[0] / 10000, 4) if measures is not None else None
+
+
+@qgsfunction(args='auto', group=GROUP, usesgeometry=True, referenced_columns=[], register=False)
+def mc_perimeter_km(feature, parent, context):
+    """
+    Perimeter of the current polygon in kilometres, measured in the UTM zone of
+    its centroid, or in the Polyconic projection when it is wider than 5.9 degrees.
+    <h4>Example</h4><p>mc_perimeter_km() &rarr; 1.2345</p>
+    """
+    measures = measure_feature(feature, context, QgsWkbTypes.PolygonGeometry)
+    return round(measures[1] / 1000, 4) if measures is not None else None
+
+
+@qgsfunction(args='auto', group=GROUP, usesgeometry=True, referenced_columns=[], register=False)
+def mc_length_km(feature, parent, context):
+    """
+    Length of the current line in kilometres, measured in the UTM zone of its
+    centroid, or in the Polyconic projection when it is wider than 5.9 degrees.
+    <h4>Example</h4><p>mc_length_km() &rarr; 1.2345</p>
+    """
+    measures = measure_feature(feature, context, QgsWkbTypes.LineGeometry)
+    return round(measures[1] / 1000, 4) if measures is not None else None
+
+
+FUNCTIONS = (mc_area_ha, mc_perimeter_km, mc_length_km)
+
+
+def register_functions():
+    global measurer
+    measurer = ExpressionMeasurer()
+    QgsProject.instance().layersWillBeRemoved.connect(measurer.remove_layers)
+    for function in FUNCTIONS:
+        QgsExpression.registerFunction(function)
+
+
+def unregister_functions():
+    global measurer
+    for function in FUNCTIONS:
+        QgsExpression.unregisterFunction(function.name())
+    if measurer is not None:
+        try:
+            QgsProject.instance().layersWillBeRemoved.disconnect(measurer.remove_layers)
+        except TypeError:
+            pass
+        measurer.clear()
+        measurer = None
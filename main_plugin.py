@@ -1,13 +1,584 @@
-from qgis.PyQt.QtWidgets import QDialog, QVBoxLayout, QAction, QCheckBox, QLabel, QPushButton
+from qgis.PyQt.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QAction, QCheckBox, QLabel, QPushButton,
+    QProgressBar, QSpinBox, QWidget, QTableWidget, QTableWidgetItem, QFileDialog,
+    QListWidget, QListWidgetItem, QComboBox
+)
 from qgis.PyQt.QtGui import QIcon
-from qgis.PyQt.QtCore import QLocale, QVariant, Qt, QMetaType, QT_VERSION_STR
+from qgis.gui import QgsCheckableComboBox, QgsDockWidget, QgsFileWidget
+from qgis.PyQt.QtCore import QLocale, Qt, QTimer, QT_VERSION_STR
 from qgis.core import (
-    QgsProject, QgsWkbTypes, QgsField, QgsCoordinateTransform,
-    QgsCoordinateReferenceSystem, QgsGeometry, QgsVectorLayer,
-    QgsFeature, Qgis, QgsMessageLog, QgsUnitTypes
+    QgsProject, QgsWkbTypes, QgsField, QgsCoordinateReferenceSystem,
+    QgsGeometry, QgsVectorLayer, QgsFeature, Qgis, QgsMessageLog, QgsUnitTypes,
+    QgsApplication, QgsTask, QgsFeatureRequest, QgsVectorLayerFeatureSource,
+    QgsVectorDataProvider, QgsTransaction, QgsFields, QgsVectorFileWriter
 )
 from qgis.utils import iface
 import os
+import csv
+import math
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from .batch_measure import HAS_BATCH_SUPPORT
+from .parallel_measure import ParallelMeasurer
+from .measure_engine import (
+    read_setting, write_setting, measure_field_names, TransformCache, MeasureEngine,
+    RunningSum, GroupedMeasures, measure_caches, CACHE_SIZE, STREAM_VERTICES, QVariantDouble, QVariantLongLong
+)
+from .processing_provider import MeasureCalculatorProvider
+from .profiling import StageProfiler
+from .pushdown_measure import ProviderPushdown
+from .expression_functions import register_functions, unregister_functions
+
+class MeasureTask(QgsTask):
+    """Runs a MeasureEngine over the selected features in a background task"""
+
+    CHUNK_SIZE = 1000
+    PARALLEL_MIN_FEATURES = 20000
+
+    def __init__(self, layer, description, fids=None, profiler=None, parallel=True):
+        super().__init__(description, QgsTask.CanCancel)
+        # Tudo que vem da camada é lido aqui, ainda na thread principal
+        self.layer_id = layer.id()
+        self.source = QgsVectorLayerFeatureSource(layer)
+        self.fids = layer.selectedFeatureIds() if fids is None else set(fids)
+        self.engine = MeasureEngine(
+            layer.crs(),
+            layer.geometryType(),
+            vectorized=read_setting('vectorized', False),
+            cache=measure_caches.for_layer(layer, len(self.fids))
+        )
+        # Tarefas que rodam junto com outras não abrem o próprio pool de processos
+        self.workers = read_setting('parallel_workers', 0) if parallel else 0
+        self.pushdown = ProviderPushdown.for_layer(layer) if read_setting('pushdown', False) else None
+        self.exception = None
+        self.profiler = profiler
+        if profiler is not None:
+            self.engine.instrument(profiler)
+            profiler.wrap(self, 'merge_next', 'parallel_merge')
+            profiler.wrap(self, 'run_pushdown', 'database_pushdown')
+
+    def use_parallel(self, total):
+        return (
+            self.workers > 1
+            and ParallelMeasurer.available()
+            and self.engine.src_def is not None
+            and total >= self.PARALLEL_MIN_FEATURES
+            and (self.engine.results.is_polygon() or self.engine.results.is_line())
+        )
+
+    def run(self):
+        if self.profiler is None:
+            return self.measure()
+
+        self.profiler.enable_cprofile()
+        try:
+            with self.profiler.stage('calculate_measures'):
+                return self.measure()
+        finally:
+            self.profiler.disable_cprofile()
+
+    def measure(self):
+        try:
+            total = len(self.fids)
+            fids = self.fids
+            done = 0
+            if self.pushdown is not None:
+                fids = self.run_pushdown(total)
+                if fids is None:
+                    return False
+                done = total - len(fids)
+                if not fids:
+                    self.setProgress(100.0)
+                    return True
+
+            request = QgsFeatureRequest().setFilterFids(fids).setSubsetOfAttributes([])
+            if self.use_parallel(len(fids)):
+                return self.run_parallel(request, total, done)
+
+            chunk = []
+            for feat in self.source.getFeatures(request):
+                chunk.append(feat)
+                if len(chunk) < self.CHUNK_SIZE:
+                    continue
+
+                self.engine.measure_chunk(chunk)
+                done += len(chunk)
+                chunk = []
+                if self.isCanceled():
+                    return False
+                self.setProgress(100.0 * done / total)
+
+            if chunk:
+                self.engine.measure_chunk(chunk)
+
+            self.setProgress(100.0)
+            return True
+
+        except Exception as e:
+            self.exception = e
+            return False
+
+    def run_pushdown(self, total):
+        """
+        Measure in the layer's database; returns the fids left for the Python path,
+        or None when cancelled. Any database error leaves the remaining fids to Python
+        """
+        measured = set()
+        try:
+            for fid, target, area, length in self.pushdown.rows(self.fids):
+                if target is None or area is None or length is None:
+                    continue
+                self.engine.add_measured(fid, area, length, f'EPSG:{target}')
+                measured.add(fid)
+                if len(measured) % self.CHUNK_SIZE == 0:
+                    if self.isCanceled():
+                        return None
+                    self.setProgress(100.0 * len(measured) / total)
+
+        except Exception as e:
+            QgsMessageLog.logMessage(
+                f"{self.tr('Database measurement failed, using the Python engine:')} {e}",
+                "Calculadora de Medidas",
+                Qgis.Warning
+            )
+        return {fid for fid in self.fids if fid not in measured}
+
+    def run_parallel(self, request, total, done=0):
+        """Measure WKB chunks in worker processes and merge them back in order"""
+        pool = ParallelMeasurer(self.workers)
+        src_def = self.engine.src_def
+        pending = deque()
+        try:
+            chunk = ([], [], [], [])
+            for feat in self.source.getFeatures(request):
+                if not self.engine.measurable(feat):
+                    continue
+                fids, wkbs, keys, entries = chunk
+                geom = feat.geometry()
+                if self.engine.is_large(geom):
+                    # Medida aqui, parte a parte e sem cache, em vez de ir inteira em WKB a um processo
+                    wkb = key = None
+                    entry = self.measure_large(geom)
+                else:
+                    wkb = bytes(geom.asWkb())
+                    key = self.engine.cache_key(wkb)
+                    entry = self.engine.cached(feat.id(), key)
+                fids.append(feat.id())
+                wkbs.append(wkb)
+                keys.append(key)
+                entries.append(entry)
+                if len(fids) < self.CHUNK_SIZE:
+                    continue
+
+                pending.append(self.submit(pool, src_def, chunk))
+                chunk = ([], [], [], [])
+
+                # Limita os blocos em andamento para manter a memória estável
+                while len(pending) >= 2 * self.workers:
+                    done += self.merge_next(pending)
+                    if self.isCanceled():
+                        return False
+                    self.setProgress(100.0 * done / total)
+
+            if chunk[0]:
+                pending.append(self.submit(pool, src_def, chunk))
+
+            while pending:
+                done += self.merge_next(pending)
+                if self.isCanceled():
+                    return False
+                self.setProgress(100.0 * done / total)
+
+            return True
+
+        finally:
+            pool.shutdown(cancel=self.isCanceled())
+
+    def measure_large(self, geom):
+        """Measure a geometry above the streaming threshold in this thread; returns a cache-style entry"""
+        area, length, crs = self.engine.measure_single(geom)
+        return area, length, crs.authid()
+
+    @staticmethod
+    def submit(pool, src_def, chunk):
+        fids, wkbs, keys, entries = chunk
+        # Só as feições ausentes do cache vão para os processos
+        missing = [wkb for wkb, entry in zip(wkbs, entries) if entry is None]
+        return chunk, pool.submit(src_def, missing)
+
+    def merge_next(self, pending):
+        chunk, future = pending.popleft()
+        self.engine.merge_chunk(*chunk, future.result())
+        return len(chunk[0])
+
+    def tr(self, text):
+        translations = {
+            "Database measurement failed, using the Python engine:":
+            "Falha na medição no banco de dados, usando o motor Python:"
+        }
+        if QLocale().name().startswith('pt'):
+            return translations.get(text, text)
+        return text
+
+class BulkAttributeWriter:
+    """Writes attribute values straight to the data provider in batches"""
+
+    BATCH_SIZE = 5000
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.provider = layer.dataProvider()
+
+    def field_indexes(self, fields):
+        """Resolve the provider index of each field once"""
+        indexes = {}
+        for field in fields:
+            idx = self.provider.fields().lookupField(field)
+            if idx == -1:
+                raise Exception(self.tr("Field not found:") + f" {field}")
+            indexes[field] = idx
+        return indexes
+
+    def write(self, values):
+        """
+        Write an iterable of (fid, {field index: value}) pairs
+        Uses a single transaction when the provider supports it
+        """
+        transaction = self.begin_transaction()
+        try:
+            batch = {}
+            for fid, attributes in values:
+                batch[fid] = attributes
+                if len(batch) >= self.BATCH_SIZE:
+                    self.write_batch(batch)
+                    batch = {}
+            if batch:
+                self.write_batch(batch)
+
+            if transaction is not None:
+                ok, error = transaction.commit()
+                if not ok:
+                    raise Exception(error)
+
+        except Exception:
+            if transaction is not None:
+                transaction.rollback()
+            raise
+
+        self.layer.reload()
+
+    def write_batch(self, batch):
+        if not self.provider.changeAttributeValues(batch):
+            errors = self.provider.errors()
+            raise Exception(self.tr("Error updating features:") + (f" {errors[-1]}" if errors else ""))
+
+    def begin_transaction(self):
+        """Start a database transaction when the provider supports it"""
+        if not QgsTransaction.supportsTransaction(self.layer):
+            return None
+
+        transaction = QgsTransaction.create({self.layer})
+        if transaction is None:
+            return None
+
+        ok, error = transaction.begin()
+        if not ok:
+            raise Exception(error)
+        return transaction
+
+    def tr(self, text):
+        translations = {
+            "Field not found:": "Campo não encontrado:",
+            "Error updating features:": "Erro ao atualizar feições:"
+        }
+        if QLocale().name().startswith('pt'):
+            return translations.get(text, text)
+        return text
+
+class WatchedLayer:
+    """Edit signals of one layer and the fids whose geometry changed since the last commit"""
+
+    def __init__(self, layer, watcher):
+        self.layer = layer
+        self.dirty = set()
+        # Fids já atualizados no buffer de edição durante o commit em andamento
+        self.written = set()
+        self.handlers = [
+            (layer.geometryChanged, lambda fid, geom: self.dirty.add(fid)),
+            (layer.featureAdded, self.dirty.add),
+            (layer.featureDeleted, self.dirty.discard),
+            (layer.afterRollBack, self.dirty.clear),
+            (layer.beforeCommitChanges, lambda *args: watcher.write_dirty(self)),
+            (layer.committedGeometriesChanges, lambda layer_id, geometries: watcher.refresh_committed(self, geometries)),
+        ]
+        for signal, handler in self.handlers:
+            signal.connect(handler)
+
+    def disconnect(self):
+        for signal, handler in self.handlers:
+            try:
+                signal.disconnect(handler)
+            except (TypeError, RuntimeError):
+                pass
+        self.handlers = []
+
+    def field_indexes(self):
+        """Layer indexes of the measure fields, or None when the layer does not have all of them"""
+        indexes = [self.layer.fields().lookupField(name) for name in measure_field_names(self.layer.geometryType())]
+        return indexes if indexes and -1 not in indexes else None
+
+class MeasureFieldWatcher:
+    """Keeps the measure fields of edited layers up to date, recomputing only the edited features"""
+
+    def __init__(self):
+        self.layers = {}
+        self.transforms = None
+
+    def start(self):
+        if self.transforms is not None:
+            return
+        self.transforms = TransformCache()
+        project = QgsProject.instance()
+        project.layersAdded.connect(self.watch_layers)
+        project.layerWillBeRemoved.connect(self.unwatch)
+        self.watch_layers(project.mapLayers().values())
+
+    def stop(self):
+        if self.transforms is None:
+            return
+        project = QgsProject.instance()
+        try:
+            project.layersAdded.disconnect(self.watch_layers)
+            project.layerWillBeRemoved.disconnect(self.unwatch)
+        except TypeError:
+            pass
+        for layer_id in list(self.layers):
+            self.unwatch(layer_id)
+        self.transforms = None
+
+    def watch_layers(self, layers):
+        for layer in layers:
+            if (
+                isinstance(layer, QgsVectorLayer)
+                and layer.geometryType() in (QgsWkbTypes.PolygonGeometry, QgsWkbTypes.LineGeometry)
+                and layer.id() not in self.layers
+            ):
+                self.layers[layer.id()] = WatchedLayer(layer, self)
+
+    def unwatch(self, layer_id):
+        watched = self.layers.pop(layer_id, None)
+        if watched is not None:
+            watched.disconnect()
+
+    def engine(self, layer):
+        """Engine shared by the features of one write (settings and CRS are read once)"""
+        return MeasureEngine(layer.crs(), layer.geometryType(), transforms=self.transforms)
+
+    @staticmethod
+    def measures(engine, geom):
+        """Rounded measures of a geometry, in the order of measure_field_names"""
+        if geom is None or geom.isEmpty():
+            return [None] * len(measure_field_names(engine.results.geom_type))
+
+        area, length, _ = engine.measure_single(QgsGeometry(geom))
+        if engine.results.is_polygon():
+            return [round(area / 10000, 4), round(length / 1000, 4)]
+        return [round(length / 1000, 4)]
+
+    def write_dirty(self, watched):
+        """Before the commit: write the measures of the edited features into the edit buffer, once"""
+        indexes = watched.field_indexes()
+        dirty, watched.dirty = watched.dirty, set()
+        if indexes is None or not dirty:
+            return
+
+        layer = watched.layer
+        engine = self.engine(layer)
+        request = QgsFeatureRequest().setFilterFids(dirty).setSubsetOfAttributes([])
+        for feat in layer.getFeatures(request):
+            geom = feat.geometry() if feat.hasGeometry() else None
+            layer.changeAttributeValues(feat.id(), dict(zip(indexes, self.measures(engine, geom))))
+        # Fids negativos (feições novas) mudam no commit e não voltam em committedGeometriesChanges
+        watched.written = {fid for fid in dirty if fid >= 0}
+
+    def refresh_committed(self, watched, geometries):
+        """
+        After the commit: geometries committed without going through write_dirty
+        (e.g. the watcher was started mid-edit) are written straight to the provider
+        """
+        missed = {fid: QgsGeometry(geom) for fid, geom in geometries.items() if fid not in watched.written}
+        watched.written = set()
+        if missed and watched.field_indexes() is not None:
+            # O provedor só é escrito depois que o commit termina
+            QTimer.singleShot(0, lambda: self.write_committed(watched.layer, missed))
+
+    def write_committed(self, layer, geometries):
+        try:
+            names = measure_field_names(layer.geometryType())
+            writer = BulkAttributeWriter(layer)
+            indexes = writer.field_indexes(names)
+            field_idx = [indexes[name] for name in names]
+            engine = self.engine(layer)
+            writer.write(
+                (fid, dict(zip(field_idx, self.measures(engine, geom))))
+                for fid, geom in geometries.items()
+            )
+        except Exception as e:
+            QgsMessageLog.logMessage(
+                f"{self.tr('Could not update the measure fields of')} {layer.name()}: {e}",
+                "Calculadora de Medidas",
+                Qgis.Warning
+            )
+
+    def tr(self, text):
+        translations = {
+            "Could not update the measure fields of": "Não foi possível atualizar os campos de medidas de"
+        }
+        if QLocale().name().startswith('pt'):
+            return translations.get(text, text)
+        return text
+
+class TempLayerBuilder:
+    """Creates the temporary results layer in chunks, copying only the chosen fields"""
+
+    CHUNK_SIZE = 5000
+
+    def __init__(self, layer, results, field_names=None):
+        self.layer = layer
+        self.results = results
+        names = layer.fields().names() if field_names is None else field_names
+        self.source_indexes = [
+            idx for idx in (layer.fields().lookupField(name) for name in names) if idx != -1
+        ]
+        # O fid original só é acrescentado se ainda não vier entre os campos copiados
+        self.add_fid = 'fid' not in names
+
+    def fields(self):
+        fields = QgsFields()
+        for idx in self.source_indexes:
+            fields.append(self.layer.fields().at(idx))
+        if self.add_fid:
+            fields.append(QgsField('fid', QVariantLongLong, 'int8'))
+
+        for name in measure_field_names(self.results.geom_type):
+            fields.append(QgsField(name, QVariantDouble, 'double', 20, 4))
+        return fields
+
+    def build(self, name):
+        geom_type = 'Polygon' if self.results.is_polygon() else 'LineString'
+        temp_layer = QgsVectorLayer(f"{geom_type}?crs={self.layer.crs().authid()}", name, "memory")
+
+        provider = temp_layer.dataProvider()
+        provider.addAttributes(self.fields().toList())
+        temp_layer.updateFields()
+        fields = temp_layer.fields()
+
+        for chunk in self.chunks(fields):
+            self.add_features(provider, chunk)
+
+        temp_layer.updateExtents()
+        return temp_layer
+
+    def chunks(self, fields, with_geometry=True):
+        """Yield the result features in lists of CHUNK_SIZE, read from the layer as they are written"""
+        request = QgsFeatureRequest().setFilterFids(set(self.results.fids)).setSubsetOfAttributes(self.source_indexes)
+        if not with_geometry:
+            request.setFlags(QgsFeatureRequest.NoGeometry)
+
+        chunk = []
+        for feat in self.layer.getFeatures(request):
+            attributes = [feat.attribute(idx) for idx in self.source_indexes]
+            if self.add_fid:
+                attributes.append(feat.id())
+            pos = self.results.position(feat.id())
+            attributes.extend(round(value, 4) for value in self.results.measures_at(pos))
+
+            new_feat = QgsFeature(fields)
+            if with_geometry:
+                new_feat.setGeometry(feat.geometry())
+            new_feat.setAttributes(attributes)
+            chunk.append(new_feat)
+
+            if len(chunk) >= self.CHUNK_SIZE:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def add_features(provider, features):
+        ok, _ = provider.addFeatures(features)
+        if not ok:
+            errors = provider.errors()
+            raise Exception(errors[-1] if errors else "addFeatures failed")
+
+class ResultFileWriter(TempLayerBuilder):
+    """Streams the results to a GeoPackage, CSV or FlatGeobuf file, one chunk at a time"""
+
+    # Extensão -> driver do GDAL
+    DRIVERS = {
+        '.gpkg': 'GPKG',
+        '.csv': 'CSV',
+        '.fgb': 'FlatGeobuf'
+    }
+    FILE_FILTER = "GeoPackage (*.gpkg);;CSV (*.csv);;FlatGeobuf (*.fgb)"
+
+    def __init__(self, layer, results, field_names=None, attributes_only=False):
+        super().__init__(layer, results, field_names)
+        self.attributes_only = attributes_only
+
+    @classmethod
+    def driver_for(cls, path):
+        return cls.DRIVERS.get(os.path.splitext(path)[1].lower())
+
+    def write(self, path):
+        driver = self.driver_for(path)
+        if driver is None:
+            raise Exception(self.tr("Unsupported file format:") + f" {os.path.basename(path)}")
+        if self.attributes_only and driver == 'FlatGeobuf':
+            raise Exception(self.tr("FlatGeobuf files need geometries"))
+
+        fields = self.fields()
+        wkb_type = QgsWkbTypes.NoGeometry if self.attributes_only else self.layer.wkbType()
+        layer_options = ['GEOMETRY=AS_WKT'] if driver == 'CSV' and not self.attributes_only else []
+        writer = self.create_writer(path, driver, fields, wkb_type, layer_options)
+        if writer.hasError() != QgsVectorFileWriter.NoError:
+            raise Exception(writer.errorMessage())
+
+        try:
+            for chunk in self.chunks(fields, with_geometry=not self.attributes_only):
+                if not writer.addFeatures(chunk):
+                    raise Exception(writer.errorMessage())
+        finally:
+            # Fecha o arquivo e grava o que ainda estiver em buffer
+            del writer
+
+    def create_writer(self, path, driver, fields, wkb_type, layer_options):
+        if hasattr(QgsVectorFileWriter, 'create'):
+            options = QgsVectorFileWriter.SaveVectorOptions()
+            options.driverName = driver
+            options.fileEncoding = 'UTF-8'
+            options.layerName = os.path.splitext(os.path.basename(path))[0]
+            options.layerOptions = layer_options
+            return QgsVectorFileWriter.create(
+                path, fields, wkb_type, self.layer.crs(), QgsProject.instance().transformContext(), options
+            )
+        # QGIS < 3.10
+        return QgsVectorFileWriter(
+            path, 'UTF-8', fields, wkb_type, self.layer.crs(), driver, [], layer_options
+        )
+
+    def tr(self, text):
+        translations = {
+            "Unsupported file format:": "Formato de arquivo não suportado:",
+            "FlatGeobuf files need geometries": "Arquivos FlatGeobuf precisam de geometrias"
+        }
+        if QLocale().name().startswith('pt'):
+            return translations.get(text, text)
+        return text
 
 class MeasureCalculatorPlugin:
     """Measure Calculator Plugin for QGIS"""
@@ -15,9 +586,24 @@ class MeasureCalculatorPlugin:
     def __init__(self, iface):
         self.iface = iface
         self.dialog = None
+        self.live_dock = None
+        self.provider = None
+        self.field_watcher = MeasureFieldWatcher()
+
+    def initProcessing(self):
+        """Register the Processing provider (also called by qgis_process)"""
+        if self.provider is not None:
+            return
+        self.provider = MeasureCalculatorProvider()
+        QgsApplication.processingRegistry().addProvider(self.provider)
 
     def initGui(self):
         """Initialize plugin interface"""
+        self.initProcessing()
+        register_functions()
+        if read_setting('auto_refresh', False):
+            self.field_watcher.start()
+
         icon_path = os.path.join(os.path.dirname(__file__), 'icon.png')
         self.action = QAction(
             QIcon(icon_path),
@@ -28,10 +614,33 @@ class MeasureCalculatorPlugin:
         self.iface.addPluginToMenu(self.tr("Measure Calculator"), self.action)
         self.iface.addToolBarIcon(self.action)
 
+        self.settings_action = QAction(self.tr("Settings"), self.iface.mainWindow())
+        self.settings_action.triggered.connect(self.show_settings)
+        self.iface.addPluginToMenu(self.tr("Measure Calculator"), self.settings_action)
+
+        self.multi_action = QAction(self.tr("Measure multiple layers"), self.iface.mainWindow())
+        self.multi_action.triggered.connect(self.run_multi)
+        self.iface.addPluginToMenu(self.tr("Measure Calculator"), self.multi_action)
+
+        self.live_action = QAction(self.tr("Live measurement panel"), self.iface.mainWindow())
+        self.live_action.setCheckable(True)
+        self.live_action.toggled.connect(self.toggle_live_dock)
+        self.iface.addPluginToMenu(self.tr("Measure Calculator"), self.live_action)
+
     def unload(self):
         """Remove plugin from interface"""
+        self.toggle_live_dock(False)
         self.iface.removePluginMenu(self.tr("Measure Calculator"), self.action)
+        self.iface.removePluginMenu(self.tr("Measure Calculator"), self.settings_action)
+        self.iface.removePluginMenu(self.tr("Measure Calculator"), self.multi_action)
+        self.iface.removePluginMenu(self.tr("Measure Calculator"), self.live_action)
         self.iface.removeToolBarIcon(self.action)
+        measure_caches.clear()
+        unregister_functions()
+        self.field_watcher.stop()
+        if self.provider is not None:
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
 
     def run(self):
         """Main execution flow"""
@@ -45,7 +654,7 @@ class MeasureCalculatorPlugin:
                 )
                 return
 
-            if not layer.selectedFeatures():
+            if not layer.selectedFeatureCount():
                 self.show_message(
                     self.tr("Warning"),
                     self.tr("No features selected in active layer!"),
@@ -59,6 +668,31 @@ class MeasureCalculatorPlugin:
         except Exception as e:
             self.show_message(self.tr("Error"), str(e), Qgis.Critical)
 
+    def run_multi(self):
+        """Measure several layers from the layer tree at once"""
+        self.dialog = MultiLayerDialog(self.iface)
+        DialogExec(self.dialog)
+
+    def toggle_live_dock(self, checked):
+        """Show the live measurement panel, or stop it and remove it"""
+        if checked and self.live_dock is None:
+            self.live_dock = LiveMeasureDock(self.iface)
+            self.live_dock.closed.connect(lambda: self.live_action.setChecked(False))
+            self.iface.addDockWidget(QtRightDockWidgetArea, self.live_dock)
+        elif not checked and self.live_dock is not None:
+            self.live_dock.shutdown()
+            self.iface.removeDockWidget(self.live_dock)
+            self.live_dock.deleteLater()
+            self.live_dock = None
+
+    def show_settings(self):
+        """Open the calculation options"""
+        if DialogExec(SettingsDialog(self.iface.mainWindow())):
+            if read_setting('auto_refresh', False):
+                self.field_watcher.start()
+            else:
+                self.field_watcher.stop()
+
     def show_message(self, title, message, level):
         """Show messages in QGIS message bar"""
         self.iface.messageBar().pushMessage(
@@ -73,6 +707,9 @@ class MeasureCalculatorPlugin:
         translations = {
             "Measure Calculator": "Calculadora de Medidas",
             "Warning": "Aviso",
+            "Settings": "Configurações",
+            "Live measurement panel": "Painel de medição ao vivo",
+            "Measure multiple layers": "Medir várias camadas",
             "No active layer selected!": "Nenhuma camada ativa selecionada!",
             "No features selected in active layer!": "Não há feições selecionadas na camada ativa!",
             "Error": "Erro",
@@ -83,122 +720,115 @@ class MeasureCalculatorPlugin:
             return translations.get(text, text)
         return text
 
-class CalculatorDialog(QDialog):
-    """Main calculation dialog"""
-
-    MAX_CRS_DISPLAY = 10
+class SettingsDialog(QDialog):
+    """Options used by the next calculations"""
 
-    def __init__(self, layer, iface):
-        super().__init__()
-        self.iface = iface
-        self.layer = layer
-        self.results = {
-            'total': 0,
-            'area': [],
-            'perimeter': [],
-            'length': [],
-            'utm': {},
-            'conic': {},
-            'geom_type': layer.geometryType(),
-            'all_crs': set()
-        }
+    def __init__(self, parent=None):
+        super().__init__(parent)
         self.setup_ui()
-        self.calculate_measures()
-        self.setWindowTitle(self.tr("Measure Calculator"))
-        self.setMinimumSize(400, 300)
+        self.setWindowTitle(self.tr("Measure Calculator Settings"))
 
     def setup_ui(self):
         """Setup UI components"""
-        layout = QVBoxLayout()
-        
-        self.lbl_results = QLabel()
-        self.lbl_results.setTextFormat(QtRichText)
-        self.lbl_results.setWordWrap(True)
-        self.lbl_results.setTextInteractionFlags(QtTextSelectableByMouse)
-        self.lbl_results.setStyleSheet("""
-            QLabel {
-                border: 1px solid #cccccc;
-                padding: 5px;
-                border-radius: 3px;
-                margin: 2px;
-            }
-        """)
-        layout.addWidget(self.lbl_results)
+        layout = QFormLayout()
 
-        self.chk_update = QCheckBox(self.tr("Update fields in original layer"))
-        self.chk_update.setEnabled(not self.layer.isEditable() and self.layer.geometryType() != QgsWkbTypes.PointGeometry)
-        layout.addWidget(self.chk_update)
+        self.chk_vectorized = QCheckBox(self.tr("Use vectorised engine (NumPy/pyproj)"))
+        self.chk_vectorized.setChecked(HAS_BATCH_SUPPORT and read_setting('vectorized', False))
+        self.chk_vectorized.setEnabled(HAS_BATCH_SUPPORT)
+        if not HAS_BATCH_SUPPORT:
+            self.chk_vectorized.setToolTip(self.tr("NumPy and pyproj are not installed"))
+        layout.addRow(self.chk_vectorized)
 
-        self.chk_temp = QCheckBox(self.tr("Create temporary layer"))
-        layout.addWidget(self.chk_temp)
+        self.spin_workers = QSpinBox()
+        self.spin_workers.setRange(0, os.cpu_count() or 1)
+        self.spin_workers.setValue(read_setting('parallel_workers', 0))
+        self.spin_workers.setEnabled(ParallelMeasurer.available())
+        self.spin_workers.setToolTip(self.tr("Used for selections of at least {} features").format(
+            MeasureTask.PARALLEL_MIN_FEATURES
+        ))
+        layout.addRow(self.tr("Parallel worker processes (0 = off)"), self.spin_workers)
 
-        self.btn_ok = QPushButton(self.tr("OK"))
-        self.btn_ok.clicked.connect(self.process)
-        layout.addWidget(self.btn_ok)
+        self.spin_cache = QSpinBox()
+        self.spin_cache.setRange(0, 10000000)
+        self.spin_cache.setSingleStep(10000)
+        self.spin_cache.setValue(read_setting('cache_size', CACHE_SIZE))
+        self.spin_cache.setToolTip(self.tr("Not used for selections larger than the cache"))
+        layout.addRow(self.tr("Cached features per layer (0 = off)"), self.spin_cache)
 
-        self.setLayout(layout)
+        self.spin_stream = QSpinBox()
+        self.spin_stream.setRange(0, 1000000000)
+        self.spin_stream.setSingleStep(100000)
+        self.spin_stream.setValue(read_setting('stream_vertices', STREAM_VERTICES))
+        self.spin_stream.setToolTip(self.tr("Larger geometries are reprojected one part and ring at a time"))
+        layout.addRow(self.tr("Measure part by part above this many vertices (0 = off)"), self.spin_stream)
 
-    def calculate_measures(self):
-        """Perform measurements calculation"""
-        try:
-            for feat in self.layer.selectedFeatures():
-                geom = feat.geometry()
-                src_crs = self.layer.crs()
-                
-                centroid = self.transform_centroid(geom, src_crs)
-                crs = self.select_crs(geom, src_crs, centroid)
-                
-                xform = QgsCoordinateTransform(src_crs, crs, QgsProject.instance())
-                geom.transform(xform)
-
-                if self.results['geom_type'] == QgsWkbTypes.PolygonGeometry:
-                    self.results['area'].append(geom.area() / 10000)
-                    self.results['perimeter'].append(geom.length() / 1000)
-                elif self.results['geom_type'] == QgsWkbTypes.LineGeometry:
-                    self.results['length'].append(geom.length() / 1000)
-
-                self.count_crs(crs)
-                self.results['total'] += 1
+        self.chk_pushdown = QCheckBox(self.tr("Measure in the database when possible (GeoPackage, SpatiaLite, PostGIS)"))
+        self.chk_pushdown.setChecked(read_setting('pushdown', False))
+        layout.addRow(self.chk_pushdown)
 
-            self.display_results()
+        self.chk_auto_refresh = QCheckBox(self.tr("Keep measure fields up to date after geometry edits"))
+        self.chk_auto_refresh.setToolTip(self.tr("Only layers that already have the area_ha/perim_km or length_km fields"))
+        self.chk_auto_refresh.setChecked(read_setting('auto_refresh', False))
+        layout.addRow(self.chk_auto_refresh)
 
-        except Exception as e:
-            self.iface.messageBar().pushMessage(
-                self.tr("Error"),
-                str(e),
-                Qgis.Critical,
-                3
-            )
+        self.chk_profile = QCheckBox(self.tr("Profile calculation stages"))
+        self.chk_profile.setChecked(read_setting('profile', False))
+        layout.addRow(self.chk_profile)
 
-    def transform_centroid(self, geometry, src_crs):
-        transform = QgsCoordinateTransform(
-            src_crs,
-            QgsCoordinateReferenceSystem('EPSG:4326'),
-            QgsProject.instance()
-        )
-        return transform.transform(geometry.centroid().asPoint())
+        self.chk_cprofile = QCheckBox(self.tr("Also capture cProfile statistics"))
+        self.chk_cprofile.setChecked(read_setting('profile_cprofile', False))
+        self.chk_cprofile.setEnabled(self.chk_profile.isChecked())
+        self.chk_profile.toggled.connect(self.chk_cprofile.setEnabled)
+        layout.addRow(self.chk_cprofile)
 
-    def select_crs(self, geometry, src_crs, centroid):
-        bbox = geometry.boundingBox()
-        transform = QgsCoordinateTransform(src_crs, QgsCoordinateReferenceSystem('EPSG:4326'), QgsProject.instance())
-        transform.transformBoundingBox(bbox)
-        
-        if (bbox.xMaximum() - bbox.xMinimum()) > 5.9:
-            crs = QgsCoordinateReferenceSystem('ESRI:54034')
-        else:
-            utm_zone = int((centroid.x() + 180) // 6) + 1
-            epsg = 32600 + utm_zone if centroid.y() >= 0 else 32700 + utm_zone
-            crs = QgsCoordinateReferenceSystem(f'EPSG:{epsg}')
-            
-        self.results['all_crs'].add(crs.authid())
-        return crs
+        self.btn_ok = QPushButton(self.tr("OK"))
+        self.btn_ok.clicked.connect(self.save)
+        layout.addRow(self.btn_ok)
 
-    def count_crs(self, crs):
-        authid = crs.authid()
-        if 'ESRI:54034' in authid:
-            self.results['conic'][authid] = self.results['conic'].get(authid, 0) + 1
-        else:
-            self.results['utm'][authid] = self.results['utm'].get(authid, 0) + 1
+        self.setLayout(layout)
+
+    def save(self):
+        write_setting('vectorized', self.chk_vectorized.isChecked())
+        write_setting('parallel_workers', self.spin_workers.value())
+        write_setting('cache_size', self.spin_cache.value())
+        write_setting('stream_vertices', self.spin_stream.value())
+        write_setting('pushdown', self.chk_pushdown.isChecked())
+        write_setting('auto_refresh', self.chk_auto_refresh.isChecked())
+        write_setting('profile', self.chk_profile.isChecked())
+        write_setting('profile_cprofile', self.chk_cprofile.isChecked())
+        self.accept()
+
+    def tr(self, text):
+        translations = {
+            "Measure Calculator Settings": "Configurações da Calculadora de Medidas",
+            "Use vectorised engine (NumPy/pyproj)": "Usar motor vetorizado (NumPy/pyproj)",
+            "NumPy and pyproj are not installed": "NumPy e pyproj não estão instalados",
+            "Parallel worker processes (0 = off)": "Processos paralelos (0 = desativado)",
+            "Used for selections of at least {} features": "Usado em seleções com pelo menos {} feições",
+            "Cached features per layer (0 = off)": "Feições em cache por camada (0 = desativado)",
+            "Not used for selections larger than the cache": "Não é usado em seleções maiores que o cache",
+            "Measure part by part above this many vertices (0 = off)":
+            "Medir parte a parte acima deste número de vértices (0 = desativado)",
+            "Larger geometries are reprojected one part and ring at a time":
+            "Geometrias maiores são reprojetadas uma parte e um anel por vez",
+            "Measure in the database when possible (GeoPackage, SpatiaLite, PostGIS)":
+            "Medir no banco de dados quando possível (GeoPackage, SpatiaLite, PostGIS)",
+            "Keep measure fields up to date after geometry edits":
+            "Manter os campos de medidas atualizados após editar geometrias",
+            "Only layers that already have the area_ha/perim_km or length_km fields":
+            "Somente camadas que já têm os campos area_ha/perim_km ou length_km",
+            "Profile calculation stages": "Medir o tempo das etapas do cálculo",
+            "Also capture cProfile statistics": "Capturar também estatísticas do cProfile",
+            "OK": "OK"
+        }
+        if QLocale().name().startswith('pt'):
+            return translations.get(text, text)
+        return text
+
+class ResultsFormatter:
+    """HTML and unit formatting shared by the windows that show results"""
+
+    MAX_CRS_DISPLAY = 10
 
     def get_project_units(self):
         """Retorna as unidades de medida configuradas no projeto"""
@@ -252,48 +882,35 @@ class CalculatorDialog(QDialog):
             
         return (value, "")
 
-    def display_results(self):
-        msg = f"<b>{self.tr('RESULTS')}</b><br><br>"
-        
-        if self.results['geom_type'] == QgsWkbTypes.PolygonGeometry:
-            total_area = sum(self.results['area'])
+    def totals_section(self, geom_type, total_area, total_perim, total_length, count):
+        msg = ""
+        if geom_type == QgsWkbTypes.PolygonGeometry:
             area_proj, area_unit = self.convert_to_project_units(total_area, 'area')
             msg += (
                 f"<b>{self.tr('Total Area')}:</b> {self.format_number(total_area)} ha<br>"
                 f"&nbsp;&nbsp;&nbsp;&nbsp;{self.format_number(area_proj)} {area_unit}<br>"
             )
 
-            total_perim = sum(self.results['perimeter'])
             perim_proj, perim_unit = self.convert_to_project_units(total_perim, 'distance')
             msg += (
                 f"<b>{self.tr('Total Perimeter')}:</b> {self.format_number(total_perim)} km<br>"
                 f"&nbsp;&nbsp;&nbsp;&nbsp;{self.format_number(perim_proj)} {perim_unit}<br><br>"
             )
             
-        elif self.results['geom_type'] == QgsWkbTypes.LineGeometry:
-            total_length = sum(self.results['length'])
+        elif geom_type == QgsWkbTypes.LineGeometry:
             length_proj, length_unit = self.convert_to_project_units(total_length, 'distance')
             msg += (
                 f"<b>{self.tr('Total Length')}:</b> {self.format_number(total_length)} km<br>"
                 f"&nbsp;&nbsp;&nbsp;&nbsp;{self.format_number(length_proj)} {length_unit}<br><br>"
             )
         
-        msg += f"<b>{self.tr('Processed Features')}:</b> {self.results['total']}<br><br>"
-        msg += self.build_crs_section()
-        
-        self.lbl_results.setText(msg)
-        self.log_to_message_panel(msg)
-        self.iface.messageBar().pushMessage(
-            self.tr("Success"),
-            self.tr("Calculations completed"),
-            Qgis.Success,
-            3
-        )
+        msg += f"<b>{self.tr('Processed Features')}:</b> {count}<br><br>"
+        return msg
 
-    def build_crs_section(self):
+    def build_crs_section(self, utm, conic):
         section = ""
-        utm_items = list(self.results['utm'].items())
-        conic_items = list(self.results['conic'].items())
+        utm_items = list(utm.items())
+        conic_items = list(conic.items())
         
         if utm_items:
             section += f"<b>{self.tr('UTM Projection')}:</b><br>"
@@ -332,58 +949,514 @@ class CalculatorDialog(QDialog):
     def format_number(self, value):
         return QLocale().toString(float(value), 'f', 4)
 
-    def process(self):
-        try:
-            if self.chk_update.isChecked():
-                self.update_fields()
-            
-            if self.chk_temp.isChecked():
-                self.create_temp_layer()
-            
-            self.layer.removeSelection()
-            self.accept()
+class LiveMeasureDock(QgsDockWidget, ResultsFormatter):
+    """Dockable panel with running totals that follow the active layer's selection"""
 
-        except Exception as e:
-            self.iface.messageBar().pushMessage(
-                self.tr("Error"),
-                str(e),
-                Qgis.Critical,
-                3
-            )
+    # Acima deste número de feições novas a medição vai para uma tarefa em segundo plano
+    SYNC_LIMIT = 2000
 
-    def update_fields(self):
-        try:
-            if self.layer.isEditable():
-                raise Exception(
-                    self.tr("Layer is already in edit mode!") + "\n" +
-                    self.tr("Save or cancel edits before proceeding.")
-                )  # Fechamento do raise
+    def __init__(self, iface):
+        super().__init__(iface.mainWindow())
+        self.iface = iface
+        self.layer = None
+        self.tasks = []
+        self.setObjectName('MeasureCalculatorLiveDock')
+        self.setWindowTitle(self.tr("Live Measures"))
+        self.reset()
+        self.setup_ui()
 
-            if not self.layer.startEditing():
-                raise Exception(self.tr("Layer is not editable!"))
+        self.iface.currentLayerChanged.connect(self.set_layer)
+        self.set_layer(self.iface.activeLayer())
 
-            fields = []
-            if self.results['geom_type'] == QgsWkbTypes.PolygonGeometry:
-                fields = ['area_ha', 'perim_km']
-            elif self.results['geom_type'] == QgsWkbTypes.LineGeometry:
-                fields = ['length_km']
+    def setup_ui(self):
+        """Setup UI components"""
+        widget = QWidget()
+        layout = QVBoxLayout()
 
-            # Adiciona campos e atualiza
-            self.add_fields(fields)
+        self.lbl_results = QLabel()
+        self.lbl_results.setTextFormat(QtRichText)
+        self.lbl_results.setWordWrap(True)
+        self.lbl_results.setTextInteractionFlags(QtTextSelectableByMouse)
+        layout.addWidget(self.lbl_results)
+        layout.addStretch()
+
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+    def reset(self):
+        self.transforms = TransformCache()
+        self.measures = {}   # fid -> (área em ha, perímetro ou comprimento em km, CRS)
+        self.pending = set()
+        self.area = RunningSum()
+        self.perimeter = RunningSum()
+        self.length = RunningSum()
+        self.counts = {}
+
+    def shutdown(self):
+        self.iface.currentLayerChanged.disconnect(self.set_layer)
+        self.set_layer(None)
+
+    def set_layer(self, layer):
+        if self.layer is not None:
+            try:
+                self.layer.selectionChanged.disconnect(self.on_selection_changed)
+            except (TypeError, RuntimeError):
+                pass
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        self.reset()
+
+        self.layer = layer if isinstance(layer, QgsVectorLayer) and layer.isSpatial() else None
+        if self.layer is not None:
+            self.layer.selectionChanged.connect(self.on_selection_changed)
+            self.add_features(list(self.layer.selectedFeatureIds()))
+        self.refresh()
+
+    def on_selection_changed(self, selected, deselected, clear_and_select):
+        if clear_and_select:
+            keep = set(selected)
+            deselected = [fid for fid in list(self.measures) + list(self.pending) if fid not in keep]
+
+        for fid in deselected:
+            self.remove_feature(fid)
+        self.add_features([fid for fid in selected if fid not in self.measures and fid not in self.pending])
+        self.refresh()
+
+    def add_features(self, fids):
+        if not fids:
+            return
+
+        if len(fids) > self.SYNC_LIMIT:
+            self.pending.update(fids)
+            task = MeasureTask(self.layer, f"{self.tr('Live Measures')} - {self.layer.name()}", fids=fids)
+            task.taskCompleted.connect(lambda: self.on_task_completed(task))
+            task.taskTerminated.connect(lambda: self.on_task_terminated(task))
+            self.tasks.append(task)
+            QgsApplication.taskManager().addTask(task)
+            return
+
+        engine = MeasureEngine(
+            self.layer.crs(),
+            self.layer.geometryType(),
+            transforms=self.transforms,
+            vectorized=read_setting('vectorized', False),
+            cache=measure_caches.for_layer(self.layer, len(fids))
+        )
+        request = QgsFeatureRequest().setFilterFids(set(fids)).setSubsetOfAttributes([])
+        engine.measure_chunk(list(self.layer.getFeatures(request)))
+        self.merge_results(engine.results)
+
+    def on_task_completed(self, task):
+        if task in self.tasks:
+            self.tasks.remove(task)
+            if self.layer is not None and task.layer_id == self.layer.id():
+                # Só entram as feições que continuam selecionadas
+                self.merge_results(task.engine.results, pending_only=True)
+                # Feições sem geometria não têm resultado e deixam de estar pendentes
+                self.pending.difference_update(task.fids)
+                self.refresh()
+
+    def on_task_terminated(self, task):
+        if task in self.tasks:
+            self.tasks.remove(task)
+            self.pending.difference_update(task.fids)
+            self.refresh()
+
+    def merge_results(self, results, pending_only=False):
+        for pos, fid in enumerate(results.fids):
+            if pending_only:
+                if fid not in self.pending:
+                    continue
+                self.pending.discard(fid)
+
+            if results.is_polygon():
+                entry = (results.area[pos], results.perimeter[pos], results.crs_at(pos))
+            elif results.is_line():
+                entry = (0.0, results.length[pos], results.crs_at(pos))
+            else:
+                entry = (0.0, 0.0, results.crs_at(pos))
+
+            self.measures[fid] = entry
+            self.apply(entry, 1)
+
+    def remove_feature(self, fid):
+        self.pending.discard(fid)
+        entry = self.measures.pop(fid, None)
+        if entry is not None:
+            self.apply(entry, -1)
+
+    def apply(self, entry, sign):
+        """Add (sign=1) or subtract (sign=-1) one feature from the running totals"""
+        area, length, authid = entry
+        if self.layer.geometryType() == QgsWkbTypes.PolygonGeometry:
+            self.area.add(sign * area)
+            self.perimeter.add(sign * length)
+        else:
+            self.length.add(sign * length)
+
+        count = self.counts.get(authid, 0) + sign
+        if count:
+            self.counts[authid] = count
+        else:
+            self.counts.pop(authid, None)
+
+    def refresh(self):
+        if self.layer is None:
+            self.lbl_results.setText(self.tr("Select a vector layer with geometries"))
+            return
+
+        msg = f"<b>{self.layer.name()}</b><br><br>"
+        msg += self.totals_section(
+            self.layer.geometryType(),
+            self.area.value,
+            self.perimeter.value,
+            self.length.value,
+            len(self.measures)
+        )
+        if self.pending:
+            msg += f"{self.tr('Measuring')}: {len(self.pending)} {self.tr('features')}<br><br>"
+
+        utm = {authid: count for authid, count in self.counts.items() if 'ESRI:54034' not in authid}
+        conic = {authid: count for authid, count in self.counts.items() if 'ESRI:54034' in authid}
+        msg += self.build_crs_section(utm, conic)
+        self.lbl_results.setText(msg)
+
+    def tr(self, text):
+        translations = {
+            "Live Measures": "Medidas ao Vivo",
+            "Select a vector layer with geometries": "Selecione uma camada vetorial com geometrias",
+            "Measuring": "Medindo",
+            "Total Area": "Área Total",
+            "Total Perimeter": "Perímetro Total",
+            "Total Length": "Comprimento Total",
+            "Processed Features": "Feições Processadas",
+            "UTM Projection": "Projeção UTM",
+            "Conic Projection": "Projeção Policônica",
+            "features": "feições",
+            "Unknown CRS": "CRS Desconhecido",
+            "more": "mais"
+        }
+        if QLocale().name().startswith('pt'):
+            return translations.get(text, text)
+        return text
+
+class CalculatorDialog(QDialog, ResultsFormatter):
+    """Main calculation dialog"""
+
+    MAX_PROFILE_STAGES = 6
+
+    def __init__(self, layer, iface):
+        super().__init__()
+        self.iface = iface
+        self.layer = layer
+        self.task = None
+        self.engine = None
+        self.workers = 0
+        self.results = None
+        self.profiler = None
+        self.profile_file = None
+        self.setup_ui()
+        self.calculate_measures()
+        self.setWindowTitle(self.tr("Measure Calculator"))
+        self.setMinimumSize(400, 300)
+
+    def setup_ui(self):
+        """Setup UI components"""
+        layout = QVBoxLayout()
+        
+        self.lbl_results = QLabel()
+        self.lbl_results.setTextFormat(QtRichText)
+        self.lbl_results.setWordWrap(True)
+        self.lbl_results.setTextInteractionFlags(QtTextSelectableByMouse)
+        self.lbl_results.setStyleSheet("""
+            QLabel {
+                border: 1px solid #cccccc;
+                padding: 5px;
+                border-radius: 3px;
+                margin: 2px;
+            }
+        """)
+        layout.addWidget(self.lbl_results)
+
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 100)
+        layout.addWidget(self.progress)
+
+        self.btn_cancel = QPushButton(self.tr("Cancel"))
+        self.btn_cancel.clicked.connect(self.cancel_calculation)
+        layout.addWidget(self.btn_cancel)
+
+        self.chk_update = QCheckBox(self.tr("Update fields in original layer"))
+        self.chk_update.setEnabled(not self.layer.isEditable() and self.layer.geometryType() != QgsWkbTypes.PointGeometry)
+        layout.addWidget(self.chk_update)
+
+        self.chk_temp = QCheckBox(self.tr("Create temporary layer"))
+        layout.addWidget(self.chk_temp)
+
+        self.chk_file = QCheckBox(self.tr("Write results to file"))
+        layout.addWidget(self.chk_file)
+
+        self.file_output = QgsFileWidget()
+        self.file_output.setStorageMode(FileWidgetSaveFile)
+        self.file_output.setFilter(ResultFileWriter.FILE_FILTER)
+        self.file_output.setEnabled(False)
+        self.chk_file.toggled.connect(self.file_output.setEnabled)
+        layout.addWidget(self.file_output)
+
+        self.chk_attributes_only = QCheckBox(self.tr("Attributes only (no geometry)"))
+        self.chk_attributes_only.setEnabled(False)
+        self.chk_file.toggled.connect(self.chk_attributes_only.setEnabled)
+        layout.addWidget(self.chk_attributes_only)
+
+        layout.addWidget(QLabel(self.tr("Fields to copy to the temporary layer or file:")))
+        self.cmb_temp_fields = QgsCheckableComboBox()
+        self.cmb_temp_fields.setDefaultText(self.tr("Only measures and fid"))
+        self.cmb_temp_fields.addItems(self.layer.fields().names())
+        self.cmb_temp_fields.setCheckedItems(self.layer.fields().names())
+        self.cmb_temp_fields.setEnabled(False)
+        self.chk_temp.toggled.connect(self.update_field_choice)
+        self.chk_file.toggled.connect(self.update_field_choice)
+        layout.addWidget(self.cmb_temp_fields)
+
+        layout.addWidget(QLabel(self.tr("Group statistics by:")))
+        self.cmb_group_fields = QgsCheckableComboBox()
+        self.cmb_group_fields.setDefaultText(self.tr("No grouping"))
+        self.cmb_group_fields.addItems(self.layer.fields().names())
+        layout.addWidget(self.cmb_group_fields)
+
+        self.btn_group = QPushButton(self.tr("Grouped statistics"))
+        self.btn_group.setEnabled(False)
+        self.btn_group.clicked.connect(self.show_grouped_statistics)
+        layout.addWidget(self.btn_group)
+
+        self.btn_ok = QPushButton(self.tr("OK"))
+        self.btn_ok.setEnabled(False)
+        self.btn_ok.clicked.connect(self.process)
+        layout.addWidget(self.btn_ok)
+
+        self.setLayout(layout)
+
+    def update_field_choice(self):
+        self.cmb_temp_fields.setEnabled(self.chk_temp.isChecked() or self.chk_file.isChecked())
+
+    def calculate_measures(self):
+        """Start the measurements calculation in a background task"""
+        if read_setting('profile', False):
+            self.profiler = StageProfiler(read_setting('profile_cprofile', False))
+        self.task = MeasureTask(
+            self.layer,
+            f"{self.tr('Measure Calculator')} - {self.layer.name()}",
+            profiler=self.profiler
+        )
+        self.engine = self.task.engine
+        self.workers = self.task.workers
+        self.results = self.engine.results
+        self.task.progressChanged.connect(self.on_progress)
+        self.task.taskCompleted.connect(self.on_calculation_completed)
+        self.task.taskTerminated.connect(self.on_calculation_terminated)
+
+        self.lbl_results.setText(self.tr("Calculating..."))
+        QgsApplication.taskManager().addTask(self.task)
+
+    def on_progress(self, value):
+        self.progress.setValue(int(value))
+
+    def on_calculation_completed(self):
+        # O gerenciador de tarefas apaga a tarefa ao terminar; não deve mais ser acessada
+        self.task = None
+        self.progress.setValue(100)
+        self.btn_cancel.setEnabled(False)
+        self.btn_ok.setEnabled(True)
+        self.btn_group.setEnabled(self.results.is_polygon() or self.results.is_line())
+        self.display_results()
+
+    def on_calculation_terminated(self):
+        exception = self.task.exception
+        self.task = None
+        self.btn_cancel.setEnabled(False)
+        if exception is not None:
+            self.lbl_results.setText(str(exception))
+            self.iface.messageBar().pushMessage(
+                self.tr("Error"),
+                str(exception),
+                Qgis.Critical,
+                3
+            )
+        else:
+            self.lbl_results.setText(self.tr("Calculation cancelled"))
+
+    def cancel_calculation(self):
+        # self.task só existe enquanto a tarefa está em andamento
+        if self.task is not None:
+            self.task.cancel()
+
+    def reject(self):
+        self.cancel_calculation()
+        super().reject()
+
+    def display_results(self):
+        with self.stage('display_results'):
+            msg = f"<b>{self.tr('RESULTS')}</b><br><br>"
+            msg += self.totals_section(
+                self.results.geom_type,
+                self.results.total_area(),
+                self.results.total_perimeter(),
+                self.results.total_length(),
+                self.results.total
+            )
+            msg += self.build_crs_section(self.results.utm, self.results.conic)
+
+            self.lbl_results.setText(msg)
+            self.log_to_message_panel(msg)
+
+        if self.profiler is not None:
+            self.lbl_results.setText(msg + self.profile_section(self.save_profile()))
+        QgsMessageLog.logMessage(
+            f"{self.tr('Result store memory')}: {self.format_number(self.results.memory_usage() / 1024)} KB",
+            "Calculadora de Medidas",
+            Qgis.Info
+        )
+        self.iface.messageBar().pushMessage(
+            self.tr("Success"),
+            self.tr("Calculations completed"),
+            Qgis.Success,
+            3
+        )
+
+    def show_grouped_statistics(self):
+        fields = self.cmb_group_fields.checkedItems()
+        if not fields:
+            self.iface.messageBar().pushMessage(
+                self.tr("Warning"),
+                self.tr("Choose at least one field to group by"),
+                Qgis.Warning,
+                3
+            )
+            return
+
+        try:
+            with self.stage('group_statistics'):
+                grouped = GroupedMeasures.collect(self.layer, self.results, fields)
+            DialogExec(GroupedStatisticsDialog(grouped, self))
+
+        except Exception as e:
+            self.iface.messageBar().pushMessage(
+                self.tr("Error"),
+                str(e),
+                Qgis.Critical,
+                3
+            )
+
+    def stage(self, name):
+        """Time a block when profiling is enabled"""
+        return self.profiler.stage(name) if self.profiler is not None else nullcontext()
+
+    def profile_path(self):
+        """JSON report of this run, in the profile folder (same file for the calculation and write-back)"""
+        if self.profile_file is None:
+            folder = os.path.join(QgsApplication.qgisSettingsDirPath(), 'MeasureCalculator', 'profiles')
+            os.makedirs(folder, exist_ok=True)
+            stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.profiler.started))
+            self.profile_file = os.path.join(folder, f'profile-{stamp}.json')
+        return self.profile_file
+
+    def save_profile(self):
+        """Write the profile report and log where it is"""
+        path = self.profile_path()
+        report = self.profiler.save(
+            path,
+            layer=self.layer.name(),
+            source_crs=self.layer.crs().authid(),
+            features=self.results.total,
+            vectorized=self.engine.batch is not None,
+            parallel_workers=self.workers,
+            slowest_features_scope=(
+                'features measured one by one with QgsGeometry; features measured in batches, '
+                'in worker processes or in the database are only timed per stage'
+            )
+        )
+        QgsMessageLog.logMessage(
+            f"{self.tr('Profile report')}: {path}",
+            "Calculadora de Medidas",
+            Qgis.Info
+        )
+        return report
+
+    def profile_section(self, report):
+        """Summary of the slowest stages and features"""
+        msg = f"<br><b>{self.tr('PROFILE')}</b><br>"
+        for stage in report['stages'][:self.MAX_PROFILE_STAGES]:
+            msg += (
+                f"{stage['stage']}: {self.format_number(stage['seconds'])} s "
+                f"({stage['calls']} {self.tr('calls')})<br>"
+            )
+        if report['slowest_features']:
+            slowest = report['slowest_features'][0]
+            msg += (
+                f"{self.tr('Slowest feature')}: fid {slowest['fid']}, "
+                f"{slowest['vertices']} {self.tr('vertices')}, "
+                f"{self.format_number(slowest['seconds'] * 1000)} ms<br>"
+            )
+        else:
+            note = self.tr("Features measured in batches, in parallel or in the database are only timed per stage")
+            msg += f"{note}<br>"
+        return msg
+
+    def process(self):
+        try:
+            if self.chk_update.isChecked():
+                with self.stage('update_fields'):
+                    self.update_fields()
+            
+            if self.chk_temp.isChecked():
+                with self.stage('create_temp_layer'):
+                    self.create_temp_layer()
+
+            if self.chk_file.isChecked():
+                with self.stage('write_file'):
+                    self.write_results_file()
+
+            if self.profiler is not None:
+                self.save_profile()
+
+            self.layer.removeSelection()
+            self.accept()
+
+        except Exception as e:
+            self.iface.messageBar().pushMessage(
+                self.tr("Error"),
+                str(e),
+                Qgis.Critical,
+                3
+            )
+
+    def update_fields(self):
+        try:
+            if self.layer.isEditable():
+                raise Exception(
+                    self.tr("Layer is already in edit mode!") + "\n" +
+                    self.tr("Save or cancel edits before proceeding.")
+                )  # Fechamento do raise
+
+            if not self.layer.dataProvider().capabilities() & QgsVectorDataProvider.ChangeAttributeValues:
+                raise Exception(self.tr("Layer is not editable!"))
+
+            fields = measure_field_names(self.results.geom_type)
+
+            # Adiciona campos e atualiza
+            self.add_fields(fields)
             self.layer.updateFields()  # Garante reconhecimento dos novos campos
             self.populate_fields(fields)
 
-            # Commit das alterações
-            if self.layer.commitChanges():
-                self.iface.messageBar().pushMessage(
-                    self.tr("Success"),
-                    self.tr("Fields updated successfully"),
-                    Qgis.Success,
-                    3
-                )
+            self.iface.messageBar().pushMessage(
+                self.tr("Success"),
+                self.tr("Fields updated successfully"),
+                Qgis.Success,
+                3
+            )
 
         except Exception as e:
-            self.layer.rollBack()
             self.iface.messageBar().pushMessage(
                 self.tr("Error"),
                 str(e),
@@ -408,68 +1481,20 @@ class CalculatorDialog(QDialog):
             # self.layer.updateFields() # Moved to update_fields function
 
     def populate_fields(self, fields):
-        try:
-            for idx, feat in enumerate(self.layer.selectedFeatures()):
-                values = {}
-                if self.results['geom_type'] == QgsWkbTypes.PolygonGeometry:
-                    values = {
-                        'area_ha': round(self.results['area'][idx], 4),
-                        'perim_km': round(self.results['perimeter'][idx], 4)
-                    }
-                elif self.results['geom_type'] == QgsWkbTypes.LineGeometry:
-                    values = {'length_km': round(self.results['length'][idx], 4)}
-                
-                for field, value in values.items():
-                    field_idx = self.layer.fields().lookupField(field)
-                    if field_idx == -1:
-                        raise Exception(self.tr("Field not found:") + f" {field}")
-                    
-                    if not self.layer.changeAttributeValue(feat.id(), field_idx, value):
-                        raise Exception(self.tr("Error updating feature ID:") + f" {feat.id()}")
-
-        except IndexError:
-            raise Exception(self.tr("Mismatch between features and calculations!"))
+        writer = BulkAttributeWriter(self.layer)
+        indexes = writer.field_indexes(fields)
+
+        field_idx = [indexes[field] for field in fields]
+        writer.write(
+            (fid, {idx: round(value, 4) for idx, value in zip(field_idx, measures)})
+            for fid, measures in self.results.rows()
+        )
 
     def create_temp_layer(self):
         try:
-            geom_type = 'Polygon' if self.results['geom_type'] == QgsWkbTypes.PolygonGeometry else 'LineString'
-            temp_layer = QgsVectorLayer(
-                f"{geom_type}?crs={self.layer.crs().authid()}",
-                self.tr("Calculated Measures"),
-                "memory"
-            )
-
-            provider = temp_layer.dataProvider()
-            original_fields = self.layer.fields().toList()
-            
-            if self.results['geom_type'] == QgsWkbTypes.PolygonGeometry:
-                original_fields.extend([
-                    QgsField("area_ha", QVariantDouble, 'double', 20, 4),
-                    QgsField("perim_km", QVariantDouble, 'double', 20, 4)
-                ])
-            else:
-                original_fields.append(QgsField("length_km", QVariantDouble, 'double', 20, 4))
-
-            provider.addAttributes(original_fields)
-            temp_layer.updateFields()
-
-            temp_layer.startEditing()
-            for idx, feat in enumerate(self.layer.selectedFeatures()):
-                new_feat = QgsFeature(temp_layer.fields())
-                new_feat.setGeometry(feat.geometry())
-                
-                for i in range(self.layer.fields().count()):
-                    new_feat.setAttribute(i, feat.attribute(i))
-                
-                if self.results['geom_type'] == QgsWkbTypes.PolygonGeometry:
-                    new_feat["area_ha"] = round(self.results['area'][idx], 4)
-                    new_feat["perim_km"] = round(self.results['perimeter'][idx], 4)
-                else:
-                    new_feat["length_km"] = round(self.results['length'][idx], 4)
-
-                provider.addFeature(new_feat)
+            builder = TempLayerBuilder(self.layer, self.results, self.cmb_temp_fields.checkedItems())
+            temp_layer = builder.build(self.tr("Calculated Measures"))
 
-            temp_layer.commitChanges()
             QgsProject.instance().addMapLayer(temp_layer)
             self.iface.messageBar().pushMessage(
                 self.tr("Success"),
@@ -481,6 +1506,24 @@ class CalculatorDialog(QDialog):
         except Exception as e:
             raise Exception(self.tr("Error creating temporary layer:") + f" {str(e)}")
 
+    def write_results_file(self):
+        path = self.file_output.filePath()
+        if not path:
+            raise Exception(self.tr("Choose the output file"))
+        if not os.path.splitext(path)[1]:
+            path += '.gpkg'
+
+        writer = ResultFileWriter(
+            self.layer, self.results, self.cmb_temp_fields.checkedItems(), self.chk_attributes_only.isChecked()
+        )
+        writer.write(path)
+        self.iface.messageBar().pushMessage(
+            self.tr("Success"),
+            self.tr("Results written to") + f" {path}",
+            Qgis.Success,
+            3
+        )
+
     def tr(self, text):
         translations = {
             "Measure Calculator": "Calculadora de Medidas",
@@ -498,15 +1541,34 @@ class CalculatorDialog(QDialog):
             "Unknown CRS": "CRS Desconhecido",
             "Success": "Sucesso",
             "Calculations completed": "Cálculos concluídos",
+            "Calculating...": "Calculando...",
+            "Result store memory": "Memória dos resultados",
+            "Profile report": "Relatório de perfil",
+            "PROFILE": "PERFIL",
+            "calls": "chamadas",
+            "Slowest feature": "Feição mais lenta",
+            "Features measured in batches, in parallel or in the database are only timed per stage":
+            "Feições medidas em lotes, em paralelo ou no banco de dados só têm o tempo por etapa",
+            "vertices": "vértices",
+            "Calculation cancelled": "Cálculo cancelado",
+            "Cancel": "Cancelar",
             "Layer is not editable! Consider creating a temporary layer to include the"
             " calculated fields.": "Camada não é editável! Considere criar uma camada "
             "temporária para incluir os campos calculados.",
             "Fields updated successfully": "Campos atualizados com sucesso",
             "Temporary layer created": "Camada temporária criada",
+            "Fields to copy to the temporary layer or file:": "Campos a copiar para a camada temporária ou arquivo:",
+            "Group statistics by:": "Agrupar estatísticas por:",
+            "No grouping": "Sem agrupamento",
+            "Grouped statistics": "Estatísticas agrupadas",
+            "Choose at least one field to group by": "Escolha ao menos um campo para agrupar",
+            "Warning": "Aviso",
+            "Write results to file": "Gravar resultados em arquivo",
+            "Attributes only (no geometry)": "Somente atributos (sem geometria)",
+            "Choose the output file": "Escolha o arquivo de saída",
+            "Results written to": "Resultados gravados em",
+            "Only measures and fid": "Somente medidas e fid",
             "Failed to add fields!": "Falha ao adicionar campos!",
-            "Field not found:": "Campo não encontrado:",
-            "Error updating feature ID:": "Erro ao atualizar feição ID:",
-            "Mismatch between features and calculations!": "Incompatibilidade entre feições e cálculos!",
             "Error creating temporary layer:": "Erro ao criar camada temporária:",
             "more": "mais",
             "square meters": "metros quadrados",
@@ -526,14 +1588,334 @@ class CalculatorDialog(QDialog):
             return translations.get(text, text)
         return text
 
+class MultiLayerDialog(QDialog, ResultsFormatter):
+    """Measures several layers at once, one background task per layer"""
+
+    def __init__(self, iface):
+        super().__init__(iface.mainWindow())
+        self.iface = iface
+        self.tasks = {}     # id da camada -> MeasureTask ainda em andamento
+        self.finished = {}  # id da camada -> MeasureResults, ou None se falhou ou foi cancelada
+        self.progress_values = {}  # id da camada -> progresso da tarefa
+        self.names = {}
+        self.skipped = []
+        self.setup_ui()
+        self.setWindowTitle(self.tr("Measure multiple layers"))
+        self.setMinimumSize(450, 500)
+
+    def setup_ui(self):
+        """Setup UI components"""
+        layout = QVBoxLayout()
+
+        layout.addWidget(QLabel(self.tr("Layers:")))
+        self.list_layers = QListWidget()
+        selected = {layer.id() for layer in self.iface.layerTreeView().selectedLayers()}
+        for tree_layer in QgsProject.instance().layerTreeRoot().findLayers():
+            layer = tree_layer.layer()
+            if not isinstance(layer, QgsVectorLayer) or layer.geometryType() not in (
+                    QgsWkbTypes.PolygonGeometry, QgsWkbTypes.LineGeometry):
+                continue
+            item = QListWidgetItem(layer.name())
+            item.setData(QtUserRole, layer.id())
+            item.setFlags(item.flags() | QtItemIsUserCheckable)
+            item.setCheckState(QtChecked if layer.id() in selected else QtUnchecked)
+            self.list_layers.addItem(item)
+        layout.addWidget(self.list_layers)
+
+        self.cmb_scope = QComboBox()
+        self.cmb_scope.addItem(self.tr("Selected features"))
+        self.cmb_scope.addItem(self.tr("All features"))
+        layout.addWidget(self.cmb_scope)
+
+        self.btn_calculate = QPushButton(self.tr("Calculate"))
+        self.btn_calculate.clicked.connect(self.calculate_measures)
+        layout.addWidget(self.btn_calculate)
+
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 100)
+        layout.addWidget(self.progress)
+
+        self.btn_cancel = QPushButton(self.tr("Cancel"))
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self.cancel_calculation)
+        layout.addWidget(self.btn_cancel)
+
+        self.lbl_results = QLabel()
+        self.lbl_results.setTextFormat(QtRichText)
+        self.lbl_results.setWordWrap(True)
+        self.lbl_results.setTextInteractionFlags(QtTextSelectableByMouse)
+        layout.addWidget(self.lbl_results)
+
+        self.setLayout(layout)
+
+    def checked_layers(self):
+        layers = []
+        for row in range(self.list_layers.count()):
+            item = self.list_layers.item(row)
+            if item.checkState() == QtChecked:
+                layer = QgsProject.instance().mapLayer(item.data(QtUserRole))
+                if layer is not None:
+                    layers.append(layer)
+        return layers
+
+    def calculate_measures(self):
+        """Start one MeasureTask per checked layer; the task manager runs them in parallel"""
+        all_features = self.cmb_scope.currentIndex() == 1
+        self.tasks = {}
+        self.finished = {}
+        self.progress_values = {}
+        self.names = {}
+        self.skipped = []
+        for layer in self.checked_layers():
+            fids = layer.allFeatureIds() if all_features else layer.selectedFeatureIds()
+            if not fids:
+                self.skipped.append(layer.name())
+                continue
+
+            self.names[layer.id()] = layer.name()
+            # Cada camada tem a sua tarefa; um pool de processos por tarefa multiplicaria os processos
+            task = MeasureTask(
+                layer, f"{self.tr('Measure Calculator')} - {layer.name()}", fids=fids, parallel=False
+            )
+            task.progressChanged.connect(lambda value, layer_id=layer.id(): self.on_progress(layer_id, value))
+            task.taskCompleted.connect(lambda layer_id=layer.id(): self.on_task_finished(layer_id, True))
+            task.taskTerminated.connect(lambda layer_id=layer.id(): self.on_task_finished(layer_id, False))
+            self.tasks[layer.id()] = task
+            self.progress_values[layer.id()] = 0.0
+
+        if not self.tasks:
+            self.lbl_results.setText(self.tr("No features to measure in the checked layers"))
+            return
+
+        self.btn_calculate.setEnabled(False)
+        self.btn_cancel.setEnabled(True)
+        self.progress.setValue(0)
+        self.lbl_results.setText(self.tr("Calculating..."))
+        for task in self.tasks.values():
+            QgsApplication.taskManager().addTask(task)
+
+    def on_progress(self, layer_id, value):
+        # O progresso vem do sinal: as tarefas concluídas já foram apagadas pelo gerenciador
+        self.progress_values[layer_id] = value
+        self.progress.setValue(int(sum(self.progress_values.values()) / len(self.progress_values)))
+
+    def on_task_finished(self, layer_id, ok):
+        task = self.tasks.pop(layer_id)
+        self.progress_values[layer_id] = 100.0
+        self.finished[layer_id] = task.engine.results if ok else None
+        if not ok and task.exception is not None:
+            QgsMessageLog.logMessage(
+                f"{task.description()}: {task.exception}",
+                "Calculadora de Medidas",
+                Qgis.Critical
+            )
+        if not self.tasks:
+            self.btn_calculate.setEnabled(True)
+            self.btn_cancel.setEnabled(False)
+            self.progress.setValue(100)
+            self.display_results()
+
+    def cancel_calculation(self):
+        # self.tasks só guarda as tarefas em andamento
+        for task in self.tasks.values():
+            task.cancel()
+
+    def reject(self):
+        self.cancel_calculation()
+        super().reject()
+
+    def display_results(self):
+        measured = [(layer_id, results) for layer_id, results in self.finished.items() if results is not None]
+        polygons = [results for _, results in measured if results.is_polygon()]
+        lines = [results for _, results in measured if results.is_line()]
+
+        utm = {}
+        conic = {}
+        for _, results in measured:
+            for counts, totals in ((results.utm, utm), (results.conic, conic)):
+                for authid, count in counts.items():
+                    totals[authid] = totals.get(authid, 0) + count
+
+        msg = f"<b>{self.tr('RESULTS')}</b> ({len(measured)} {self.tr('layers')})<br><br>"
+        if polygons:
+            msg += self.totals_section(
+                QgsWkbTypes.PolygonGeometry,
+                math.fsum(results.total_area() for results in polygons),
+                math.fsum(results.total_perimeter() for results in polygons),
+                0.0,
+                sum(results.total for results in polygons)
+            )
+        if lines:
+            msg += self.totals_section(
+                QgsWkbTypes.LineGeometry,
+                0.0,
+                0.0,
+                math.fsum(results.total_length() for results in lines),
+                sum(results.total for results in lines)
+            )
+        msg += self.build_crs_section(utm, conic)
+
+        msg += f"<br><b>{self.tr('PER LAYER')}</b><br>"
+        for layer_id, results in self.finished.items():
+            msg += self.layer_section(self.names[layer_id], results)
+        for name in self.skipped:
+            msg += f"<br><b>{name}</b>: {self.tr('no features to measure')}<br>"
+
+        self.lbl_results.setText(msg)
+        self.log_to_message_panel(msg)
+
+    def layer_section(self, name, results):
+        if results is None:
+            return f"<br><b>{name}</b>: {self.tr('not measured (cancelled or failed)')}<br>"
+
+        msg = f"<br><b>{name}</b>: {results.total} {self.tr('features')}<br>"
+        if results.is_polygon():
+            msg += (
+                f"{self.tr('Area')}: {self.format_number(results.total_area())} ha, "
+                f"{self.tr('Perimeter')}: {self.format_number(results.total_perimeter())} km<br>"
+            )
+        else:
+            msg += f"{self.tr('Length')}: {self.format_number(results.total_length())} km<br>"
+        for label, counts in (('UTM', results.utm), (self.tr('Polyconic'), results.conic)):
+            if counts:
+                msg += f"{label}: " + ", ".join(f"{authid} ({count})" for authid, count in counts.items()) + "<br>"
+        return msg
+
+    def tr(self, text):
+        translations = {
+            "Measure multiple layers": "Medir várias camadas",
+            "Measure Calculator": "Calculadora de Medidas",
+            "Layers:": "Camadas:",
+            "Selected features": "Feições selecionadas",
+            "All features": "Todas as feições",
+            "Calculate": "Calcular",
+            "Cancel": "Cancelar",
+            "Calculating...": "Calculando...",
+            "No features to measure in the checked layers": "Nenhuma feição para medir nas camadas marcadas",
+            "RESULTS": "RESULTADOS",
+            "layers": "camadas",
+            "PER LAYER": "POR CAMADA",
+            "no features to measure": "nenhuma feição para medir",
+            "not measured (cancelled or failed)": "não medida (cancelada ou com erro)",
+            "features": "feições",
+            "Area": "Área",
+            "Perimeter": "Perímetro",
+            "Length": "Comprimento",
+            "Polyconic": "Policônica",
+            "Total Area": "Área Total",
+            "Total Perimeter": "Perímetro Total",
+            "Total Length": "Comprimento Total",
+            "Processed Features": "Feições Processadas",
+            "UTM Projection": "Projeção UTM",
+            "Conic Projection": "Projeção Policônica",
+            "Unknown CRS": "CRS Desconhecido",
+            "more": "mais"
+        }
+        if QLocale().name().startswith('pt'):
+            return translations.get(text, text)
+        return text
+
+class GroupedStatisticsDialog(QDialog, ResultsFormatter):
+    """Table of the grouped statistics, with CSV export"""
+
+    def __init__(self, grouped, parent=None):
+        super().__init__(parent)
+        self.grouped = grouped
+        self.rows = list(grouped.rows())
+        self.setup_ui()
+        self.setWindowTitle(self.tr("Grouped statistics"))
+        self.setMinimumSize(600, 400)
+
+    def setup_ui(self):
+        layout = QVBoxLayout()
+
+        header = self.grouped.header()
+        self.table = QTableWidget(len(self.rows), len(header))
+        self.table.setHorizontalHeaderLabels(header)
+        key_columns = len(self.grouped.field_names)
+        for row_idx, row in enumerate(self.rows):
+            for col_idx, value in enumerate(row):
+                if col_idx < key_columns:
+                    text = self.tr("NULL") if value is None else str(value)
+                elif col_idx == key_columns:
+                    text = str(value)
+                else:
+                    text = self.format_number(value)
+                self.table.setItem(row_idx, col_idx, QTableWidgetItem(text))
+        self.table.resizeColumnsToContents()
+        layout.addWidget(self.table)
+
+        layout.addWidget(QLabel(
+            f"{len(self.rows)} {self.tr('groups')} - {self.tr('areas in ha, perimeters and lengths in km')}"
+        ))
+
+        buttons = QHBoxLayout()
+        self.btn_export = QPushButton(self.tr("Export CSV..."))
+        self.btn_export.clicked.connect(self.export_csv)
+        buttons.addWidget(self.btn_export)
+        self.btn_close = QPushButton(self.tr("Close"))
+        self.btn_close.clicked.connect(self.accept)
+        buttons.addWidget(self.btn_close)
+        layout.addLayout(buttons)
+
+        self.setLayout(layout)
+
+    def export_csv(self):
+        path, _ = QFileDialog.getSaveFileName(self, self.tr("Export grouped statistics"), '', "CSV (*.csv)")
+        if not path:
+            return
+
+        key_columns = len(self.grouped.field_names)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.grouped.header())
+            for row in self.rows:
+                writer.writerow(
+                    ['' if value is None else value for value in row[:key_columns + 1]] +
+                    [round(value, 4) for value in row[key_columns + 1:]]
+                )
+
+        iface.messageBar().pushMessage(
+            self.tr("Success"),
+            self.tr("Grouped statistics exported to") + f" {path}",
+            Qgis.Success,
+            3
+        )
+
+    def tr(self, text):
+        translations = {
+            "Grouped statistics": "Estatísticas agrupadas",
+            "NULL": "NULO",
+            "groups": "grupos",
+            "areas in ha, perimeters and lengths in km": "áreas em ha, perímetros e comprimentos em km",
+            "Export CSV...": "Exportar CSV...",
+            "Close": "Fechar",
+            "Export grouped statistics": "Exportar estatísticas agrupadas",
+            "Success": "Sucesso",
+            "Grouped statistics exported to": "Estatísticas agrupadas exportadas para"
+        }
+        if QLocale().name().startswith('pt'):
+            return translations.get(text, text)
+        return text
+
 # Compatibility check for Qt version
 if QT_VERSION_STR.startswith('5.'):
-    QVariantDouble = QVariant.Double
     DialogExec = lambda dialog: dialog.exec_()
     QtRichText = Qt.RichText
     QtTextSelectableByMouse = Qt.TextSelectableByMouse
+    QtRightDockWidgetArea = Qt.RightDockWidgetArea
+    QtChecked = Qt.Checked
+    QtUnchecked = Qt.Unchecked
+    QtItemIsUserCheckable = Qt.ItemIsUserCheckable
+    QtUserRole = Qt.UserRole
+    FileWidgetSaveFile = QgsFileWidget.SaveFile
 else:
-    QVariantDouble = QMetaType.Type.Double
     DialogExec = lambda dialog: dialog.exec()
     QtRichText = Qt.TextFormat.RichText
     QtTextSelectableByMouse = Qt.TextInteractionFlag.TextSelectableByMouse
+    QtRightDockWidgetArea = Qt.DockWidgetArea.RightDockWidgetArea
+    QtChecked = Qt.CheckState.Checked
+    QtUnchecked = Qt.CheckState.Unchecked
+    QtItemIsUserCheckable = Qt.ItemFlag.ItemIsUserCheckable
+    QtUserRole = Qt.ItemDataRole.UserRole
+    FileWidgetSaveFile = QgsFileWidget.StorageMode.SaveFile
@@ -0,0 +1,172 @@
+from qgis.PyQt.QtCore import QLocale
+from qgis.core import (
+    QgsProcessing, QgsProcessingAlgorithm, QgsProcessingException,
+    QgsProcessingParameterFeatureSource, QgsProcessingParameterFeatureSink,
+    QgsProcessingUtils, QgsFeature, QgsFeatureSink, QgsField, QgsFields,
+    QgsWkbTypes, QgsCoordinateReferenceSystem
+)
+
+from .measure_engine import (
+    read_setting, measure_fields, TransformCache, MeasureEngine, MeasureResults,
+    QVariantString, QVariantInt
+)
+
+
+class MeasureAlgorithm(QgsProcessingAlgorithm):
+    """Measures every feature of a layer, reprojected to UTM or Polyconic"""
+
+    INPUT = 'INPUT'
+    OUTPUT = 'OUTPUT'
+    SUMMARY = 'SUMMARY'
+
+    CHUNK_SIZE = 1000
+
+    def createInstance(self):
+        return MeasureAlgorithm()
+
+    def name(self):
+        return 'measure'
+
+    def displayName(self):
+        return self.tr("Measure features (UTM/Polyconic)")
+
+    def shortHelpString(self):
+        return self.tr(
+            "Calculates area (ha) and perimeter (km) of polygons, or length (km) of lines, "
+            "reprojecting each feature to the UTM zone of its centroid, or to the Polyconic "
+            "projection (ESRI:54034) when it is wider than 5.9 degrees. "
+            "The summary output counts the features measured in each CRS."
+        )
+
+    def flags(self):
+        return super().flags() | QgsProcessingAlgorithm.FlagSupportsBatch | QgsProcessingAlgorithm.FlagCanCancel
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.INPUT,
+            self.tr("Input layer"),
+            [QgsProcessing.TypeVectorPolygon, QgsProcessing.TypeVectorLine]
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.OUTPUT,
+            self.tr("Calculated Measures")
+        ))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.SUMMARY,
+            self.tr("CRS summary"),
+            QgsProcessing.TypeVector,
+            optional=True
+        ))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        if source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
+
+        geom_type = QgsWkbTypes.geometryType(source.wkbType())
+        fields = QgsProcessingUtils.combineFields(source.fields(), measure_fields(geom_type))
+        sink, dest_id = self.parameterAsSink(
+            parameters, self.OUTPUT, context, fields, source.wkbType(), source.sourceCrs()
+        )
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        engine = MeasureEngine(
+            source.sourceCrs(),
+            geom_type,
+            transforms=TransformCache(context.transformContext()),
+            vectorized=read_setting('vectorized', False)
+        )
+
+        total = source.featureCount()
+        step = 100.0 / total if total > 0 else 0
+        utm = {}
+        conic = {}
+        done = 0
+        chunk = []
+        for feat in source.getFeatures():
+            if feedback.isCanceled():
+                break
+
+            chunk.append(feat)
+            if len(chunk) >= self.CHUNK_SIZE:
+                self.measure_chunk(engine, chunk, fields, sink, utm, conic)
+                done += len(chunk)
+                chunk = []
+                feedback.setProgress(done * step)
+
+        if chunk and not feedback.isCanceled():
+            self.measure_chunk(engine, chunk, fields, sink, utm, conic)
+
+        results = {self.OUTPUT: dest_id}
+        summary_id = self.write_summary(parameters, context, utm, conic)
+        if summary_id is not None:
+            results[self.SUMMARY] = summary_id
+        return results
+
+    @staticmethod
+    def measure_chunk(engine, chunk, fields, sink, utm, conic):
+        """Measure a chunk, write it to the sink and add its CRS counts to the summary"""
+        # Resultados novos a cada bloco mantêm a memória limitada em camadas grandes
+        engine.results = MeasureResults(engine.results.geom_type)
+        measurable = [feat for feat in chunk if feat.hasGeometry() and not feat.geometry().isEmpty()]
+        engine.measure_chunk(measurable)
+
+        positions = {fid: pos for pos, fid in enumerate(engine.results.fids)}
+        out_features = []
+        for feat in chunk:
+            pos = positions.get(feat.id())
+            measures = engine.results.measures_at(pos) if pos is not None else ()
+            if not measures:
+                measures = [None] * (fields.count() - len(feat.attributes()))
+
+            out_feat = QgsFeature(fields)
+            out_feat.setGeometry(feat.geometry())
+            out_feat.setAttributes(
+                feat.attributes() + [round(value, 4) if value is not None else None for value in measures]
+            )
+            out_features.append(out_feat)
+
+        sink.addFeatures(out_features, QgsFeatureSink.FastInsert)
+        for counts, totals in ((engine.results.utm, utm), (engine.results.conic, conic)):
+            for authid, count in counts.items():
+                totals[authid] = totals.get(authid, 0) + count
+
+    def write_summary(self, parameters, context, utm, conic):
+        fields = QgsFields()
+        fields.append(QgsField('crs', QVariantString))
+        fields.append(QgsField('projection', QVariantString))
+        fields.append(QgsField('description', QVariantString))
+        fields.append(QgsField('features', QVariantInt))
+
+        sink, summary_id = self.parameterAsSink(
+            parameters, self.SUMMARY, context, fields, QgsWkbTypes.NoGeometry, QgsCoordinateReferenceSystem()
+        )
+        if sink is None:
+            return None
+
+        for projection, counts in (('UTM', utm), ('Polyconic', conic)):
+            for authid, count in counts.items():
+                feat = QgsFeature(fields)
+                feat.setAttributes([authid, projection, QgsCoordinateReferenceSystem(authid).description(), count])
+                sink.addFeature(feat, QgsFeatureSink.FastInsert)
+        return summary_id
+
+    def tr(self, text):
+        translations = {
+            "Measure features (UTM/Polyconic)": "Medir feições (UTM/Policônica)",
+            "Input layer": "Camada de entrada",
+            "Calculated Measures": "Medidas Calculadas",
+            "CRS summary": "Resumo por SRC",
+            "Calculates area (ha) and perimeter (km) of polygons, or length (km) of lines, "
+            "reprojecting each feature to the UTM zone of its centroid, or to the Polyconic "
+            "projection (ESRI:54034) when it is wider than 5.9 degrees. "
+            "The summary output counts the features measured in each CRS.":
+            "Calcula área (ha) e perímetro (km) de polígonos, ou comprimento (km) de linhas, "
+            "reprojetando cada feição para o fuso UTM do seu centroide, ou para a projeção "
+            "Policônica (ESRI:54034) quando ela tem mais de 5,9 graus de largura. "
+            "A saída de resumo conta as feições medidas em cada SRC."
+        }
+        if QLocale().name().startswith('pt'):
+            return translations.get(text, text)
+        return text
@@ -0,0 +1,638 @@
+"""
+Measurement engine shared by the dialog, the live panel and the Processing algorithm.
+
+Nothing here touches the GUI, so the classes can be used from background tasks
+and from qgis_process.
+"""
+from qgis.PyQt.QtCore import QVariant, QMetaType, QT_VERSION_STR
+from qgis.core import (
+    QgsProject, QgsWkbTypes, QgsCoordinateTransform, QgsCoordinateReferenceSystem,
+    QgsGeometry, QgsSettings, QgsField, QgsFields, QgsFeatureRequest,
+    QgsCurve, QgsCurvePolygon, QgsGeometryCollection
+)
+import math
+import hashlib
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from .batch_measure import (
+    BatchMeasurer, HAS_BATCH_SUPPORT, CONIC_CRS, target_crs, bbox_target_crs, equivalent_target,
+    pyproj_definition
+)
+
+# Compatibility check for Qt version
+if QT_VERSION_STR.startswith('5.'):
+    QVariantDouble = QVariant.Double
+    QVariantLongLong = QVariant.LongLong
+    QVariantString = QVariant.String
+    QVariantInt = QVariant.Int
+else:
+    QVariantDouble = QMetaType.Type.Double
+    QVariantLongLong = QMetaType.Type.LongLong
+    QVariantString = QMetaType.Type.QString
+    QVariantInt = QMetaType.Type.Int
+
+SETTINGS_GROUP = 'MeasureCalculator'
+
+# Feições em cache por camada; o cache é opcional (0 = desativado)
+CACHE_SIZE = 0
+
+# Acima deste número de vértices a geometria é medida parte a parte (0 = desativado)
+STREAM_VERTICES = 1000000
+
+def read_setting(key, default):
+    """Read a plugin option, falling back to its default value"""
+    return QgsSettings().value(f'{SETTINGS_GROUP}/{key}', default, type=type(default))
+
+def write_setting(key, value):
+    QgsSettings().setValue(f'{SETTINGS_GROUP}/{key}', value)
+
+def measure_field_names(geom_type):
+    """Names of the fields that hold the measures of a geometry type"""
+    if geom_type == QgsWkbTypes.PolygonGeometry:
+        return ['area_ha', 'perim_km']
+    if geom_type == QgsWkbTypes.LineGeometry:
+        return ['length_km']
+    return []
+
+def measure_fields(geom_type):
+    fields = QgsFields()
+    for name in measure_field_names(geom_type):
+        fields.append(QgsField(name, QVariantDouble, 'double', 20, 4))
+    return fields
+
+class TransformCache:
+    """Shares CRS and transform objects across the features of a run"""
+
+    def __init__(self, context=None):
+        # O contexto é lido na thread principal; as tarefas usam esta cópia
+        self.context = context if context is not None else QgsProject.instance().transformContext()
+        self.crs_by_id = {}
+        self.transforms = {}
+
+    def crs(self, authid):
+        crs = self.crs_by_id.get(authid)
+        if crs is None:
+            crs = QgsCoordinateReferenceSystem(authid)
+            self.crs_by_id[authid] = crs
+        return crs
+
+    def transform(self, src_crs, dest_crs):
+        key = (self.crs_key(src_crs), self.crs_key(dest_crs))
+        xform = self.transforms.get(key)
+        if xform is None:
+            xform = QgsCoordinateTransform(src_crs, dest_crs, self.context)
+            self.transforms[key] = xform
+        return xform
+
+    @staticmethod
+    def crs_key(crs):
+        # CRS definidos só pelo WKT não têm authid; usa o WKT como chave
+        return crs.authid() or crs.toWkt()
+
+class MeasureResults:
+    """Measures of a run kept in contiguous columns, with an index by feature id"""
+
+    __slots__ = (
+        'geom_type', 'fids', 'area', 'perimeter', 'length', 'crs_ids', 'crs_names',
+        'utm', 'conic', 'all_crs', '_index'
+    )
+
+    def __init__(self, geom_type):
+        self.geom_type = geom_type
+        self.fids = array('q')
+        self.area = array('d')       # ha
+        self.perimeter = array('d')  # km
+        self.length = array('d')     # km
+        self.crs_ids = array('H')    # posição em crs_names
+        self.crs_names = []
+        self.utm = {}
+        self.conic = {}
+        self.all_crs = set()
+        self._index = None
+
+    @property
+    def total(self):
+        return len(self.fids)
+
+    def is_polygon(self):
+        return self.geom_type == QgsWkbTypes.PolygonGeometry
+
+    def is_line(self):
+        return self.geom_type == QgsWkbTypes.LineGeometry
+
+    def append(self, fid, area_ha, length_km, authid):
+        self.fids.append(fid)
+        if self.is_polygon():
+            self.area.append(area_ha)
+            self.perimeter.append(length_km)
+        elif self.is_line():
+            self.length.append(length_km)
+        self.crs_ids.append(self.crs_id(authid))
+        self.count_crs(authid)
+        self._index = None
+
+    def crs_id(self, authid):
+        try:
+            return self.crs_names.index(authid)
+        except ValueError:
+            self.crs_names.append(authid)
+            return len(self.crs_names) - 1
+
+    def crs_at(self, pos):
+        return self.crs_names[self.crs_ids[pos]]
+
+    def count_crs(self, authid):
+        counts = self.conic if 'ESRI:54034' in authid else self.utm
+        counts[authid] = counts.get(authid, 0) + 1
+
+    def position(self, fid):
+        """Position of the feature in the columns, or -1 when it was not measured"""
+        if self._index is None:
+            # Índice compacto: fids ordenados e suas posições, consultados por busca binária
+            order = sorted(range(len(self.fids)), key=self.fids.__getitem__)
+            self._index = (array('q', (self.fids[pos] for pos in order)), array('q', order))
+
+        sorted_fids, positions = self._index
+        idx = bisect_left(sorted_fids, fid)
+        if idx < len(sorted_fids) and sorted_fids[idx] == fid:
+            return positions[idx]
+        return -1
+
+    def measures_at(self, pos):
+        """Measures of the feature at pos: (area, perimeter) for polygons, (length,) for lines"""
+        if self.is_polygon():
+            return self.area[pos], self.perimeter[pos]
+        if self.is_line():
+            return (self.length[pos],)
+        return ()
+
+    def rows(self):
+        """Iterate (fid, measures) pairs in calculation order"""
+        for pos, fid in enumerate(self.fids):
+            yield fid, self.measures_at(pos)
+
+    # Totais com soma compensada (math.fsum) para não acumular erro de arredondamento
+    def total_area(self):
+        return math.fsum(self.area)
+
+    def total_perimeter(self):
+        return math.fsum(self.perimeter)
+
+    def total_length(self):
+        return math.fsum(self.length)
+
+    def memory_usage(self):
+        """Approximate size in bytes of the columns and of the fid index"""
+        columns = [self.fids, self.area, self.perimeter, self.length, self.crs_ids]
+        if self._index is not None:
+            columns.extend(self._index)
+        return sum(column.buffer_info()[1] * column.itemsize for column in columns)
+
+class RunningSum:
+    """Neumaier-compensated running sum that also supports removing values"""
+
+    __slots__ = ('total', 'compensation')
+
+    def __init__(self):
+        self.total = 0.0
+        self.compensation = 0.0
+
+    def add(self, value):
+        total = self.total + value
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - total) + value
+        else:
+            self.compensation += (value - total) + self.total
+        self.total = total
+
+    def remove(self, value):
+        self.add(-value)
+
+    @property
+    def value(self):
+        return self.total + self.compensation
+
+class GroupedMeasures:
+    """Count, sum, mean, min and max of each measure per group, accumulated in a single pass"""
+
+    STATISTICS = ('sum', 'mean', 'min', 'max')
+
+    def __init__(self, field_names, measure_names):
+        self.field_names = field_names
+        self.measure_names = measure_names
+        # Memória proporcional ao número de grupos, não ao de feições
+        self.groups = {}
+
+    @classmethod
+    def collect(cls, layer, results, field_names):
+        """Read only the group fields of the measured features (no geometry) and accumulate them"""
+        grouped = cls(field_names, measure_field_names(results.geom_type))
+        request = (
+            QgsFeatureRequest()
+            .setFilterFids(set(results.fids))
+            .setFlags(QgsFeatureRequest.NoGeometry)
+            .setSubsetOfAttributes(field_names, layer.fields())
+        )
+        for feat in layer.getFeatures(request):
+            pos = results.position(feat.id())
+            if pos != -1:
+                key = tuple(cls.group_value(feat.attribute(name)) for name in field_names)
+                grouped.add(key, results.measures_at(pos))
+        return grouped
+
+    @staticmethod
+    def group_value(value):
+        # NULL vira None, para agrupar e ordenar junto dos demais valores
+        if value is None or (isinstance(value, QVariant) and value.isNull()):
+            return None
+        return value
+
+    def add(self, key, measures):
+        group = self.groups.get(key)
+        if group is None:
+            group = [0, [RunningSum() for _ in measures], list(measures), list(measures)]
+            self.groups[key] = group
+
+        group[0] += 1
+        sums, mins, maxs = group[1], group[2], group[3]
+        for idx, value in enumerate(measures):
+            sums[idx].add(value)
+            if value < mins[idx]:
+                mins[idx] = value
+            if value > maxs[idx]:
+                maxs[idx] = value
+
+    def sort_key(self):
+        """
+        Sort key of the groups: the raw values with NULLs last, or their text
+        for a field whose values cannot be compared with each other
+        """
+        as_text = []
+        for idx in range(len(self.field_names)):
+            try:
+                sorted({key[idx] for key in self.groups if key[idx] is not None})
+                as_text.append(False)
+            except TypeError:
+                as_text.append(True)
+
+        def sort_key(key):
+            return tuple(
+                (value is None, str(value) if as_text[idx] and value is not None else value)
+                for idx, value in enumerate(key)
+            )
+        return sort_key
+
+    def header(self):
+        columns = list(self.field_names) + ['count']
+        for name in self.measure_names:
+            columns.extend(f'{name}_{stat}' for stat in self.STATISTICS)
+        return columns
+
+    def rows(self):
+        """Yield one list per group, in the column order of header(), sorted by group"""
+        for key in sorted(self.groups, key=self.sort_key()):
+            count, sums, mins, maxs = self.groups[key]
+            row = list(key) + [count]
+            for total, low, high in zip(sums, mins, maxs):
+                row.extend((total.value, total.value / count, low, high))
+            yield row
+
+class MeasureCache:
+    """LRU cache of the measures of a layer, keyed by fid and a hash of the geometry and source CRS"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        # Usado pela tarefa em segundo plano e pelos sinais da camada na thread principal
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def geometry_key(wkb, crs_key):
+        digest = hashlib.blake2b(wkb, digest_size=16)
+        digest.update(crs_key.encode())
+        return digest.digest()
+
+    def get(self, fid, key):
+        """Return (area in m², length in m, CRS authid) or None when missing or stale"""
+        with self.lock:
+            entry = self.entries.get(fid)
+            if entry is None or entry[0] != key:
+                return None
+            self.entries.move_to_end(fid)
+            return entry[1:]
+
+    def put(self, fid, key, area, length, authid):
+        with self.lock:
+            self.entries[fid] = (key, area, length, authid)
+            self.entries.move_to_end(fid)
+            self.trim()
+
+    def resize(self, max_size):
+        with self.lock:
+            self.max_size = max_size
+            self.trim()
+
+    def trim(self):
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, fid, *args):
+        with self.lock:
+            self.entries.pop(fid, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+class MeasureCacheRegistry:
+    """One MeasureCache per layer, invalidated by the layer's edit signals"""
+
+    def __init__(self):
+        self.caches = {}
+
+    def for_layer(self, layer, features=0):
+        """
+        Cache of the layer, or None when caching is disabled or smaller than the
+        number of features to measure (call from the main thread)
+        """
+        max_size = read_setting('cache_size', CACHE_SIZE)
+        if max_size <= 0 or features > max_size:
+            # Uma varredura maior que o cache descarta cada entrada antes de reutilizá-la
+            return None
+
+        cache = self.caches.get(layer.id())
+        if cache is None:
+            cache = MeasureCache(max_size)
+            self.caches[layer.id()] = cache
+            layer.geometryChanged.connect(cache.invalidate)
+            layer.featureDeleted.connect(cache.invalidate)
+            layer.crsChanged.connect(cache.clear)
+            layer.willBeDeleted.connect(lambda layer_id=layer.id(): self.remove(layer_id))
+        elif cache.max_size != max_size:
+            cache.resize(max_size)
+        return cache
+
+    def remove(self, layer_id):
+        cache = self.caches.pop(layer_id, None)
+        if cache is not None:
+            cache.clear()
+
+    def clear(self):
+        for layer_id in list(self.caches):
+            layer = QgsProject.instance().mapLayer(layer_id)
+            if layer is not None:
+                try:
+                    layer.geometryChanged.disconnect(self.caches[layer_id].invalidate)
+                    layer.featureDeleted.disconnect(self.caches[layer_id].invalidate)
+                    layer.crsChanged.disconnect(self.caches[layer_id].clear)
+                except TypeError:
+                    pass
+            self.remove(layer_id)
+
+measure_caches = MeasureCacheRegistry()
+
+class MeasureEngine:
+    """Measures features reprojected to UTM or Polyconic and accumulates the results"""
+
+    def __init__(self, src_crs, geom_type, transforms=None, vectorized=False, cache=None, stream_vertices=None):
+        self.src_crs = src_crs
+        self.src_key = TransformCache.crs_key(src_crs)
+        self.transforms = transforms if transforms is not None else TransformCache()
+        # Definição do CRS de origem para o pyproj; None quando ele não a entende (caminho do QGIS)
+        self.src_def = pyproj_definition(src_crs.authid(), src_crs.toWkt()) if HAS_BATCH_SUPPORT else None
+        self.batch = BatchMeasurer() if vectorized and self.src_def is not None else None
+        self.cache = cache
+        self.results = MeasureResults(geom_type)
+        # CRS de destino equivalente ao de origem: essas feições são medidas sem reprojetar
+        self.native_authid = self.native_target(src_crs)
+        if stream_vertices is None:
+            stream_vertices = read_setting('stream_vertices', STREAM_VERTICES)
+        self.stream_vertices = stream_vertices
+
+    def instrument(self, profiler):
+        """Time each stage of the pipeline, and each feature measured one by one, with a StageProfiler"""
+        profiler.wrap(self, 'cached', 'cache_lookup')
+        profiler.wrap(self, 'transform_centroid')
+        profiler.wrap(self, 'select_crs')
+        profiler.wrap(self, 'reproject', 'transform')
+        profiler.wrap(self, 'geometry_measures', 'area_length')
+        profiler.wrap(self, 'measure_streaming', 'streaming')
+        # Só as feições medidas uma a uma (caminho do QGIS) têm tempo individual
+        profiler.wrap_feature(
+            self, 'process_geometry',
+            lambda args: (args[0], 0 if args[1].isNull() else args[1].constGet().nCoordinates())
+        )
+        if self.batch is not None:
+            profiler.wrap(self.batch, 'measure', 'batch_measure')
+
+    def cache_key(self, wkb):
+        return MeasureCache.geometry_key(wkb, self.src_key) if self.cache is not None else None
+
+    def cached(self, fid, key):
+        return self.cache.get(fid, key) if key is not None else None
+
+    def add_cached(self, fid, entry):
+        self.add_measured(fid, *entry)
+
+    def add_measured(self, fid, area, length, authid, key=None):
+        """Add a feature already measured (cache, worker process or database) in authid"""
+        self.results.all_crs.add(authid)
+        self.add_result(fid, float(area), float(length), self.transforms.crs(authid), key)
+
+    @staticmethod
+    def measurable(feat):
+        # Feições sem geometria (NULL) ou vazias não têm medidas, como no algoritmo do Processing
+        return feat.hasGeometry() and not feat.geometry().isEmpty()
+
+    def measure_feature(self, feat):
+        if not self.measurable(feat):
+            return
+        geom = feat.geometry()
+        if self.is_large(geom):
+            # Sem cache: a chave exigiria uma cópia do WKB inteiro
+            self.process_geometry(feat.id(), geom)
+            return
+        key = self.cache_key(bytes(geom.asWkb())) if self.cache is not None else None
+        entry = self.cached(feat.id(), key)
+        if entry is not None:
+            self.add_cached(feat.id(), entry)
+        else:
+            self.process_geometry(feat.id(), geom, key)
+
+    def process_geometry(self, fid, geom, key=None):
+        area, length, crs = self.measure_single(geom)
+        self.add_result(fid, area, length, crs, key)
+
+    def measure_single(self, geom):
+        """Select the target CRS of one geometry and measure it: (area in m², length in m, crs)"""
+        crs = self.select_crs(geom, self.src_crs)
+        if crs.authid() == self.native_authid:
+            # Já está no CRS escolhido: mede sem transformar
+            area, length = self.geometry_measures(geom)
+        else:
+            area, length = self.measure_geometry(geom, crs)
+        return area, length, crs
+
+    def measure_chunk(self, features):
+        """Measure a chunk of features, batching the reprojection per target CRS when possible"""
+        features = [feat for feat in features if self.measurable(feat)]
+        if self.batch is None:
+            for feat in features:
+                self.measure_feature(feat)
+            return
+
+        # 1ª passada: reaproveita o cache e escolhe o CRS de destino das demais feições
+        geoms = [None] * len(features)
+        wkbs = [None] * len(features)
+        keys = [None] * len(features)
+        entries = [None] * len(features)
+        targets = [None] * len(features)
+        measures = [None] * len(features)
+        groups = {}
+        for idx, feat in enumerate(features):
+            geom = feat.geometry()
+            large = self.is_large(geom)
+            if not large:
+                wkbs[idx] = bytes(geom.asWkb())
+                keys[idx] = self.cache_key(wkbs[idx])
+                entries[idx] = self.cached(feat.id(), keys[idx])
+                if entries[idx] is not None:
+                    continue
+
+            crs = self.select_crs(geom, self.src_crs)
+            geoms[idx] = geom
+            targets[idx] = crs
+            if large:
+                # Geometrias enormes não vão para WKB, cache nem NumPy: são medidas parte a parte
+                if crs.authid() == self.native_authid:
+                    measures[idx] = self.geometry_measures(geom)
+                else:
+                    measures[idx] = self.measure_streaming(geom, crs)
+                continue
+            groups.setdefault(crs.authid(), []).append(idx)
+
+        # 2ª passada: reprojeta e mede todas as feições de cada CRS de uma vez
+        for authid, indexes in groups.items():
+            dest_def = self.src_def if authid == self.native_authid else authid
+            area, length, supported = self.batch.measure(self.src_def, dest_def, [wkbs[idx] for idx in indexes])
+            for pos, idx in enumerate(indexes):
+                if supported[pos]:
+                    measures[idx] = (float(area[pos]), float(length[pos]))
+                else:
+                    measures[idx] = self.measure_geometry(geoms[idx], targets[idx])
+
+        for idx, feat in enumerate(features):
+            if entries[idx] is not None:
+                self.add_cached(feat.id(), entries[idx])
+            else:
+                area, length = measures[idx]
+                self.add_result(feat.id(), area, length, targets[idx], keys[idx])
+
+    def merge_chunk(self, fids, wkbs, keys, entries, measured):
+        """
+        Add a chunk measured by the worker processes, keeping the original order
+        measured holds the worker's (areas, lengths, targets) for the entries not found in the cache
+        """
+        areas, lengths, targets = measured
+        pos = 0
+        for fid, wkb, key, entry in zip(fids, wkbs, keys, entries):
+            if entry is not None:
+                self.add_cached(fid, entry)
+                continue
+
+            area, length, authid = areas[pos], lengths[pos], targets[pos]
+            pos += 1
+            if authid is None:
+                # Geometria que o motor vetorizado não trata (curvas, vazias...)
+                geom = QgsGeometry()
+                geom.fromWkb(wkb)
+                self.process_geometry(fid, geom, key)
+                continue
+
+            self.add_measured(fid, area, length, authid, key)
+
+    def measure_geometry(self, geom, crs):
+        """Return (area in m², length in m) of the geometry reprojected to crs"""
+        if self.is_large(geom):
+            return self.measure_streaming(geom, crs)
+        self.reproject(geom, crs)
+        return self.geometry_measures(geom)
+
+    def is_large(self, geom):
+        # Geometria nula: constGet() devolve None
+        if self.stream_vertices <= 0 or geom.isNull():
+            return False
+        return geom.constGet().nCoordinates() > self.stream_vertices
+
+    def measure_streaming(self, geom, crs):
+        """
+        Measure a very large geometry one part and ring at a time: each ring is
+        cloned and reprojected on its own, so the whole geometry is never copied
+        """
+        xform = self.transforms.transform(self.src_crs, crs)
+        areas = []
+        lengths = []
+        for part in self.geometry_parts(geom.constGet()):
+            if isinstance(part, QgsCurvePolygon):
+                rings = [part.exteriorRing()] + [part.interiorRing(idx) for idx in range(part.numInteriorRings())]
+                for pos, ring in enumerate(rings):
+                    if ring is None:
+                        continue
+                    ring = ring.clone()
+                    ring.transform(xform)
+                    # Mesma regra de QgsCurvePolygon.area(): anel externo menos os furos
+                    area = abs(ring.sumUpArea())
+                    areas.append(area if pos == 0 else -area)
+                    lengths.append(ring.length())
+            elif isinstance(part, QgsCurve):
+                part = part.clone()
+                part.transform(xform)
+                lengths.append(part.length())
+        return math.fsum(areas), math.fsum(lengths)
+
+    @staticmethod
+    def geometry_parts(geometry):
+        """Yield the single parts of a geometry without copying them"""
+        if isinstance(geometry, QgsGeometryCollection):
+            for idx in range(geometry.numGeometries()):
+                yield from MeasureEngine.geometry_parts(geometry.geometryN(idx))
+        else:
+            yield geometry
+
+    def reproject(self, geom, crs):
+        geom.transform(self.transforms.transform(self.src_crs, crs))
+
+    def geometry_measures(self, geom):
+        return geom.area(), geom.length()
+
+    def add_result(self, fid, area, length, crs, key=None):
+        self.results.append(fid, area / 10000, length / 1000, crs.authid())
+        if key is not None:
+            self.cache.put(fid, key, area, length, crs.authid())
+
+    def transform_centroid(self, geometry, src_crs):
+        transform = self.transforms.transform(src_crs, self.transforms.crs('EPSG:4326'))
+        return transform.transform(geometry.centroid().asPoint())
+
+    def select_crs(self, geometry, src_crs):
+        transform = self.transforms.transform(src_crs, self.transforms.crs('EPSG:4326'))
+        bbox = transform.transformBoundingBox(geometry.boundingBox())
+        authid = bbox_target_crs(bbox.xMinimum(), bbox.yMinimum(), bbox.xMaximum(), bbox.yMaximum())
+        if authid is None:
+            # A caixa cruza o limite de um fuso ou o equador: decide pelo centroide
+            centroid = self.transform_centroid(geometry, src_crs)
+            authid = target_crs(centroid.x(), centroid.y(), bbox.width())
+        crs = self.transforms.crs(authid)
+        self.results.all_crs.add(authid)
+        return crs
+
+    @staticmethod
+    def native_target(crs):
+        """Target CRS authid equivalent to crs (same UTM zone on GRS80/WGS 84, or the Polyconic), or None"""
+        if crs.authid() == CONIC_CRS:
+            return CONIC_CRS
+        proj = crs.toProj() if hasattr(crs, 'toProj') else crs.toProj4()
+        return equivalent_target(proj)
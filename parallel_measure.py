@@ -0,0 +1,60 @@
+"""
+Process pool that measures chunks of WKB geometries in parallel.
+
+Workers only import batch_measure (NumPy/pyproj), never qgis, so they start
+quickly and do not need a QgsApplication.
+"""
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from .batch_measure import BatchMeasurer, HAS_BATCH_SUPPORT
+
+_measurer = None
+
+
+def measure_wkb_chunk(src_def, wkbs):
+    """Worker entry point: returns (area_m2, length_m, targets) for a chunk of WKB blobs"""
+    global _measurer
+    if _measurer is None:
+        _measurer = BatchMeasurer()
+    return _measurer.measure_auto(src_def, wkbs)
+
+
+def python_executable():
+    """Python interpreter used to spawn the workers"""
+    executable = sys.executable
+    if os.path.basename(executable).lower().startswith('python'):
+        return executable
+
+    # Dentro do QGIS sys.executable aponta para o próprio QGIS
+    for folder in (sys.exec_prefix, os.path.join(sys.exec_prefix, 'bin')):
+        for name in ('pythonw.exe', 'python.exe', 'python3', 'python'):
+            candidate = os.path.join(folder, name)
+            if os.path.isfile(candidate):
+                return candidate
+    return executable
+
+
+class ParallelMeasurer:
+    """Submits chunks of WKB geometries to a pool of worker processes"""
+
+    def __init__(self, workers):
+        context = multiprocessing.get_context('spawn')
+        context.set_executable(python_executable())
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+    @staticmethod
+    def available():
+        return HAS_BATCH_SUPPORT
+
+    def submit(self, src_def, wkbs):
+        return self.executor.submit(measure_wkb_chunk, src_def, wkbs)
+
+    def shutdown(self, cancel=False):
+        try:
+            self.executor.shutdown(wait=True, cancel_futures=cancel)
+        except TypeError:
+            # cancel_futures só existe a partir do Python 3.9
+            self.executor.shutdown(wait=True)
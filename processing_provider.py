@@ -0,0 +1,21 @@
+from qgis.PyQt.QtGui import QIcon
+from qgis.core import QgsProcessingProvider
+import os
+
+from .measure_algorithm import MeasureAlgorithm
+
+
+class MeasureCalculatorProvider(QgsProcessingProvider):
+    """Processing provider exposing the measurement engine to the toolbox and qgis_process"""
+
+    def loadAlgorithms(self):
+        self.addAlgorithm(MeasureAlgorithm())
+
+    def id(self):
+        return 'measurecalculator'
+
+    def name(self):
+        return 'Measure Calculator'
+
+    def icon(self):
+        return QIcon(os.path.join(os.path.dirname(__file__), 'icon.png'))
@@ -0,0 +1,135 @@
+"""
+Opt-in timing of the calculation stages.
+
+StageProfiler replaces the methods of an engine instance with timed wrappers,
+so runs that are not profiled keep calling the plain methods at no cost.
+"""
+import cProfile
+import heapq
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageProfiler:
+    """Cumulative time and call count per stage, plus the slowest features"""
+
+    SLOWEST_FEATURES = 10
+    CPROFILE_ROWS = 30
+
+    def __init__(self, capture_cprofile=False):
+        self.stages = {}
+        self.slowest = []  # heap de (segundos, fid, vértices)
+        self.started = time.time()
+        self.profile = cProfile.Profile() if capture_cprofile else None
+        # A tarefa e a thread principal registram etapas
+        self.lock = threading.Lock()
+
+    def add(self, stage, elapsed, calls=1):
+        with self.lock:
+            entry = self.stages.setdefault(stage, [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += calls
+
+    def add_feature(self, elapsed, fid, vertices):
+        with self.lock:
+            item = (elapsed, fid, vertices)
+            if len(self.slowest) < self.SLOWEST_FEATURES:
+                heapq.heappush(self.slowest, item)
+            elif item > self.slowest[0]:
+                heapq.heapreplace(self.slowest, item)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def wrap(self, obj, method, stage=None):
+        """Time every call of obj.method under stage (defaults to the method name)"""
+        func = getattr(obj, method)
+        name = stage or method
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - start)
+
+        setattr(obj, method, timed)
+
+    def wrap_feature(self, obj, method, describe):
+        """
+        Time obj.method as one feature, keeping the slowest ones
+        describe(args) returns the (fid, vertex count) of the call
+        """
+        func = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                fid, vertices = describe(args)
+                self.add_feature(time.perf_counter() - start, fid, vertices)
+
+        setattr(obj, method, timed)
+
+    def enable_cprofile(self):
+        """Start cProfile on the calling thread (cProfile only sees the thread that enabled it)"""
+        if self.profile is not None:
+            self.profile.enable()
+
+    def disable_cprofile(self):
+        if self.profile is not None:
+            self.profile.disable()
+
+    def cprofile_summary(self):
+        if self.profile is None:
+            return None
+        output = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=output)
+        stats.sort_stats('cumulative').print_stats(self.CPROFILE_ROWS)
+        return output.getvalue()
+
+    def report(self, **info):
+        """Structured report: stages sorted by time, slowest features and optional cProfile text"""
+        with self.lock:
+            stages = sorted(self.stages.items(), key=lambda item: item[1][0], reverse=True)
+            slowest = sorted(self.slowest, reverse=True)
+
+        report = dict(info)
+        report['started'] = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started))
+        report['stages'] = [
+            {
+                'stage': name,
+                'seconds': seconds,
+                'calls': calls,
+                'mean_ms': 1000.0 * seconds / calls if calls else 0.0,
+            }
+            for name, (seconds, calls) in stages
+        ]
+        report['slowest_features'] = [
+            {'fid': fid, 'vertices': vertices, 'seconds': seconds}
+            for seconds, fid, vertices in slowest
+        ]
+        cprofile_text = self.cprofile_summary()
+        if cprofile_text is not None:
+            report['cprofile'] = cprofile_text
+        return report
+
+    def save(self, path, **info):
+        """Write the JSON report, plus the raw cProfile stats (same name, .prof) when captured"""
+        report = self.report(**info)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        if self.profile is not None:
+            self.profile.dump_stats(os.path.splitext(path)[0] + '.prof')
+        return report
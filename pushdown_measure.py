@@ -0,0 +1,273 @@
+"""
+Measurement pushed down to the layer's database.
+
+The UTM/Polyconic rules of select_crs are translated to SQL, so GeoPackage,
+SpatiaLite and PostGIS layers are measured with ST_Transform/ST_Area/ST_Length
+without moving geometries into Python. Rows the database does not measure
+(Polyconic targets, empty or unreadable geometries) are left to the Python
+path, as are layers from any other provider.
+"""
+import sqlite3
+from pathlib import Path
+
+from qgis.core import QgsDataSourceUri, QgsProviderRegistry, QgsWkbTypes
+
+from .batch_measure import CONIC_THRESHOLD
+from .measure_engine import QVariantInt, QVariantLongLong
+
+# Frações de cada lado da extensão transformadas para longitude, como os 21 pontos por lado
+# de QgsCoordinateTransform.transformBoundingBox usados em select_crs
+DENSIFY_STEPS = '(VALUES ' + ', '.join(f'({step / 20:.2f})' for step in range(21)) + ')'
+
+# Largura em longitude da extensão de uma camada geográfica: os cantos bastam
+ENVELOPE_WIDTH_SQL = """
+    SELECT fid, {xmax}(e) - {xmin}(e) AS width
+    FROM (SELECT fid, ST_Transform(ST_Envelope(g), 4326) AS e FROM src) envelope
+"""
+
+# Camadas projetadas: a longitude extrema pode cair no meio de um lado da extensão
+DENSIFIED_WIDTH_SQL = """
+    SELECT fid, MAX(ST_X(p)) - MIN(ST_X(p)) AS width
+    FROM (
+        SELECT fid, ST_Transform({point}, 4326) AS p
+        FROM (
+            SELECT fid, ST_SRID(g) AS srid,
+                   {xmin}(g) AS x0, {ymin}(g) AS y0, {xmax}(g) AS x1, {ymax}(g) AS y1
+            FROM src
+        ) box
+        CROSS JOIN {steps} step
+        CROSS JOIN (VALUES (0), (1), (2), (3)) side
+    ) edge
+    GROUP BY fid
+"""
+
+# Ponto de cada lado: 0 = sul, 1 = norte, 2 = oeste, 3 = leste
+EDGE_X = 'CASE WHEN side.column1 < 2 THEN x0 + step.column1 * (x1 - x0) WHEN side.column1 = 2 THEN x0 ELSE x1 END'
+EDGE_Y = 'CASE WHEN side.column1 = 0 THEN y0 WHEN side.column1 = 1 THEN y1 ELSE y0 + step.column1 * (y1 - y0) END'
+
+# SRC de destino escolhido como em select_crs; NULL quando a feição vai para a Policônica,
+# que não costuma existir em spatial_ref_sys e fica com o caminho do Python
+TARGET_SQL = """
+    CASE
+        WHEN width IS NULL OR width > {threshold} THEN NULL
+        ELSE (CASE WHEN ST_Y(c) >= 0 THEN 32600 ELSE 32700 END) + {zone} + 1
+    END
+"""
+
+MEASURE_SQL = """
+WITH src AS ({source}),
+extent AS ({width}),
+picked AS (
+    SELECT fid, g, {target} AS target
+    FROM (
+        SELECT src.fid, src.g, ST_Transform(ST_Centroid(src.g), 4326) AS c, extent.width
+        FROM src JOIN extent ON extent.fid = src.fid
+    ) geo
+)
+SELECT fid, target,
+       CASE WHEN target IS NULL THEN NULL ELSE {area} END,
+       CASE WHEN target IS NULL THEN NULL ELSE {length}(ST_Transform(g, target)) END
+FROM picked
+"""
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def layer_srid(layer):
+    """EPSG code of the layer CRS, or None when it has none"""
+    auth, _, code = layer.crs().authid().partition(':')
+    return int(code) if auth == 'EPSG' and code.isdigit() else None
+
+
+class ProviderPushdown:
+    """Measures the selected features with SQL in the database behind the layer"""
+
+    # Funções de extensão e de criação de ponto de cada banco
+    XMIN, YMIN, XMAX, YMAX = 'ST_XMin', 'ST_YMin', 'ST_XMax', 'ST_YMax'
+    POINT = 'ST_SetSRID(ST_MakePoint({x}, {y}), srid)'
+
+    def __init__(self, polygon, geographic):
+        self.polygon = polygon
+        self.geographic = geographic
+
+    @staticmethod
+    def for_layer(layer):
+        """Pushdown for the layer, or None when its provider or state is not supported (main thread)"""
+        if layer.isModified():
+            # Edições pendentes ainda não estão no banco
+            return None
+        polygon = layer.geometryType() == QgsWkbTypes.PolygonGeometry
+        if not polygon and layer.geometryType() != QgsWkbTypes.LineGeometry:
+            return None
+
+        provider = layer.providerType()
+        geographic = layer.crs().isGeographic()
+        if provider in ('ogr', 'spatialite'):
+            return SpatialitePushdown.from_layer(layer, polygon, geographic)
+        if provider == 'postgres':
+            return PostgisPushdown.from_layer(layer, polygon, geographic)
+        return None
+
+    def width_sql(self):
+        """Longitude span of each feature's extent, densified like transformBoundingBox for projected layers"""
+        if self.geographic:
+            return ENVELOPE_WIDTH_SQL.format(xmin=self.XMIN, xmax=self.XMAX)
+        return DENSIFIED_WIDTH_SQL.format(
+            xmin=self.XMIN, ymin=self.YMIN, xmax=self.XMAX, ymax=self.YMAX,
+            point=self.POINT.format(x=EDGE_X, y=EDGE_Y),
+            steps=DENSIFY_STEPS
+        )
+
+    def measure_sql(self, source, zone):
+        area = 'ST_Area(ST_Transform(g, target))' if self.polygon else '0'
+        return MEASURE_SQL.format(
+            area=area,
+            length='ST_Perimeter' if self.polygon else 'ST_Length',
+            width=self.width_sql(),
+            target=TARGET_SQL.format(threshold=CONIC_THRESHOLD, zone=zone),
+            source=source
+        )
+
+
+class SpatialitePushdown(ProviderPushdown):
+    """GeoPackage (OGR) and SpatiaLite layers, through sqlite3 and mod_spatialite"""
+
+    XMIN, YMIN, XMAX, YMAX = 'MbrMinX', 'MbrMinY', 'MbrMaxX', 'MbrMaxY'
+    POINT = 'MakePoint({x}, {y}, srid)'
+
+    def __init__(self, polygon, geographic, path, table, geometry_column, key_column, srid, gpkg):
+        super().__init__(polygon, geographic)
+        self.path = path
+        self.table = table
+        self.geometry_column = geometry_column
+        self.key_column = key_column
+        self.srid = srid
+        self.gpkg = gpkg
+
+    @classmethod
+    def from_layer(cls, layer, polygon, geographic):
+        srid = layer_srid(layer)
+        if srid is None:
+            return None
+
+        if layer.providerType() == 'ogr':
+            registry = QgsProviderRegistry.instance()
+            if not hasattr(registry, 'decodeUri'):
+                return None
+            parts = registry.decodeUri('ogr', layer.source())
+            path = parts.get('path', '')
+            if not path.lower().endswith('.gpkg') or not parts.get('layerName'):
+                return None
+            # Coluna de geometria e chave primária são lidas do próprio arquivo em rows()
+            return cls(polygon, geographic, path, parts['layerName'], None, None, srid, True)
+
+        uri = QgsDataSourceUri(layer.source())
+        if uri.sql() or uri.table().startswith('('):
+            return None
+        # Sem chave primária inteira o provedor usa o ROWID como fid
+        return cls(
+            polygon, geographic, uri.database(), uri.table(), uri.geometryColumn(), uri.keyColumn() or 'ROWID',
+            srid, False
+        )
+
+    def connect(self):
+        conn = sqlite3.connect('file::memory:', uri=True)
+        try:
+            conn.enable_load_extension(True)
+            conn.load_extension('mod_spatialite')
+            conn.enable_load_extension(False)
+            conn.execute('SELECT InitSpatialMetadata(1)')
+            conn.execute('ATTACH DATABASE ? AS src', (Path(self.path).resolve().as_uri() + '?mode=ro',))
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def gpkg_columns(self, conn):
+        row = conn.execute(
+            'SELECT column_name FROM src.gpkg_geometry_columns WHERE table_name = ?', (self.table,)
+        ).fetchone()
+        if row is None:
+            raise Exception(f'{self.table} is not a GeoPackage feature table')
+        key = [info[1] for info in conn.execute(f'PRAGMA src.table_info({quote_identifier(self.table)})') if info[5]]
+        if len(key) != 1:
+            raise Exception(f'{self.table} has no single-column primary key')
+        return row[0], key[0]
+
+    def rows(self, fids):
+        """Yield (fid, target EPSG code or None, area in m², length in m) for the given fids"""
+        conn = self.connect()
+        try:
+            geometry_column, key_column = self.geometry_column, self.key_column
+            if self.gpkg:
+                geometry_column, key_column = self.gpkg_columns(conn)
+
+            conn.execute('CREATE TEMP TABLE mc_fids (fid INTEGER PRIMARY KEY)')
+            conn.executemany('INSERT INTO mc_fids VALUES (?)', ((fid,) for fid in fids))
+
+            geometry = f't.{quote_identifier(geometry_column)}'
+            if self.gpkg:
+                geometry = f'GeomFromGPB({geometry})'
+            key = 'ROWID' if key_column == 'ROWID' else quote_identifier(key_column)
+            source = (
+                f'SELECT t.{key} AS fid, SetSRID({geometry}, {self.srid}) AS g '
+                f'FROM src.{quote_identifier(self.table)} t JOIN temp.mc_fids f ON f.fid = t.{key}'
+            )
+            sql = self.measure_sql(source, 'CAST((ST_X(c) + 180) / 6 AS INTEGER)')
+            yield from conn.execute(sql)
+        finally:
+            conn.close()
+
+
+class PostgisPushdown(ProviderPushdown):
+    """PostGIS layers, through the QGIS database connection API (QGIS 3.16+)"""
+
+    CHUNK_SIZE = 10000
+
+    def __init__(self, polygon, geographic, source, schema, table, geometry_column, key_column):
+        super().__init__(polygon, geographic)
+        self.source = source
+        self.schema = schema
+        self.table = table
+        self.geometry_column = geometry_column
+        self.key_column = key_column
+
+    @classmethod
+    def from_layer(cls, layer, polygon, geographic):
+        registry = QgsProviderRegistry.instance()
+        metadata = registry.providerMetadata('postgres') if hasattr(registry, 'providerMetadata') else None
+        if metadata is None or not hasattr(metadata, 'createConnection'):
+            return None
+
+        uri = QgsDataSourceUri(layer.source())
+        key = uri.keyColumn()
+        # Só chaves int4/int8 são usadas como fid; as demais (compostas, float, numeric...)
+        # recebem fids sintéticos do provedor e não correspondem aos valores da coluna
+        fields = layer.fields()
+        idx = fields.lookupField(key) if key else -1
+        if uri.sql() or uri.table().startswith('(') or idx == -1:
+            return None
+        if fields.at(idx).type() not in (QVariantInt, QVariantLongLong):
+            return None
+        return cls(polygon, geographic, layer.source(), uri.schema(), uri.table(), uri.geometryColumn(), key)
+
+    def rows(self, fids):
+        """Yield (fid, target EPSG code or None, area in m², length in m) for the given fids"""
+        # A conexão é criada na thread que a usa
+        conn = QgsProviderRegistry.instance().providerMetadata('postgres').createConnection(self.source, {})
+        table = quote_identifier(self.table)
+        if self.schema:
+            table = f'{quote_identifier(self.schema)}.{table}'
+        key = quote_identifier(self.key_column)
+
+        fids = list(fids)
+        for start in range(0, len(fids), self.CHUNK_SIZE):
+            chunk = ','.join(str(int(fid)) for fid in fids[start:start + self.CHUNK_SIZE])
+            source = (
+                f'SELECT t.{key} AS fid, t.{quote_identifier(self.geometry_column)} AS g '
+                f'FROM {table} t WHERE t.{key} IN ({chunk})'
+            )
+            sql = self.measure_sql(source, 'floor((ST_X(c) + 180) / 6)::int')
+            yield from conn.executeSql(sql)
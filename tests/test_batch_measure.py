@@ -0,0 +1,86 @@
+"""
+Checks the vectorised engine against shapely measuring the same geometries
+reprojected one by one with pyproj, as QgsGeometry.area()/length() would.
+
+batch_measure does not import qgis, so these tests run without QGIS.
+"""
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pyproj = pytest.importorskip('pyproj')
+shapely = pytest.importorskip('shapely')
+
+from shapely import wkt as shapely_wkt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_measure import BatchMeasurer, pyproj_definition  # noqa: E402
+
+GEOMETRIES = [
+    'POLYGON ((-47.9 -15.8, -47.85 -15.8, -47.85 -15.75, -47.9 -15.75, -47.9 -15.8))',
+    'POLYGON ((-43.3 -22.95, -43.1 -22.95, -43.1 -22.8, -43.3 -22.8, -43.3 -22.95), '
+    '(-43.25 -22.9, -43.2 -22.9, -43.2 -22.85, -43.25 -22.85, -43.25 -22.9))',
+    'MULTIPOLYGON (((-60.1 -3.2, -60.0 -3.2, -60.0 -3.1, -60.1 -3.2)), '
+    '((-59.9 -3.0, -59.8 -3.0, -59.8 -2.9, -59.9 -2.9, -59.9 -3.0)))',
+    'LINESTRING (-51.2 -30.1, -51.1 -30.05, -51.0 -30.0, -50.9 -30.02)',
+    'MULTILINESTRING ((-38.5 -12.9, -38.4 -12.95), (-38.45 -13.0, -38.35 -12.98, -38.3 -12.9))',
+]
+
+
+def reference(geometry, src_def, dest_def):
+    """Area and length of a shapely geometry reprojected with pyproj"""
+    transformer = pyproj.Transformer.from_crs(src_def, dest_def, always_xy=True)
+    projected = shapely.transform(geometry, lambda xy: np.column_stack(transformer.transform(xy[:, 0], xy[:, 1])))
+    return projected.area, projected.length
+
+
+@pytest.mark.parametrize('text', GEOMETRIES)
+def test_measure_matches_shapely(text):
+    geometry = shapely_wkt.loads(text)
+    area, length, supported = BatchMeasurer().measure('EPSG:4674', 'EPSG:32723', [geometry.wkb])
+
+    expected_area, expected_length = reference(geometry, 'EPSG:4674', 'EPSG:32723')
+    assert supported[0]
+    assert area[0] == pytest.approx(expected_area, rel=1e-12, abs=1e-9)
+    assert length[0] == pytest.approx(expected_length, rel=1e-12)
+
+
+def test_measure_auto_matches_shapely():
+    geometries = [shapely_wkt.loads(text) for text in GEOMETRIES]
+    area, length, targets = BatchMeasurer().measure_auto('EPSG:4674', [g.wkb for g in geometries])
+
+    for geometry, a, l, target in zip(geometries, area, length, targets):
+        centroid = geometry.centroid
+        zone = int((centroid.x + 180) // 6) + 1
+        assert target == f'EPSG:{32700 + zone}'
+        expected_area, expected_length = reference(geometry, 'EPSG:4674', target)
+        assert a == pytest.approx(expected_area, rel=1e-12, abs=1e-9)
+        assert l == pytest.approx(expected_length, rel=1e-12)
+
+
+def test_wide_geometry_goes_to_polyconic():
+    geometry = shapely_wkt.loads('POLYGON ((-55 -10, -48 -10, -48 -9, -55 -9, -55 -10))')
+    _, _, targets = BatchMeasurer().measure_auto('EPSG:4674', [geometry.wkb])
+    assert targets == ['ESRI:54034']
+
+
+@pytest.mark.parametrize('wkb', [b'', b'\x01', b'\x01\x03\x00\x00\x00\x01\x00'])
+def test_empty_or_truncated_wkb_is_left_to_the_caller(wkb):
+    measurer = BatchMeasurer()
+    assert measurer.parse(wkb) is None
+
+    area, length, supported = measurer.measure('EPSG:4674', 'EPSG:32723', [wkb])
+    assert not supported[0] and area[0] == 0.0 and length[0] == 0.0
+
+    _, _, targets = measurer.measure_auto('EPSG:4674', [wkb])
+    assert targets == [None]
+
+
+def test_user_crs_falls_back_to_wkt():
+    wkt = pyproj.CRS('EPSG:4674').to_wkt()
+    assert pyproj_definition('USER:100000', wkt) == wkt
+    assert pyproj_definition('EPSG:4674', wkt) == 'EPSG:4674'
+    assert pyproj_definition('USER:100000', '') is None
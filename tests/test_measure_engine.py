@@ -0,0 +1,77 @@
+"""
+Runs MeasureEngine on in-memory features with QGIS offscreen.
+
+Needs the qgis module (the Python that ships with QGIS); skipped otherwise.
+"""
+import importlib
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('qgis.core')
+
+from qgis.core import QgsApplication, QgsCoordinateReferenceSystem, QgsFeature, QgsGeometry, QgsWkbTypes  # noqa: E402
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+
+measure_engine = importlib.import_module(f'{os.path.basename(PLUGIN_DIR)}.measure_engine')
+batch_measure = importlib.import_module(f'{os.path.basename(PLUGIN_DIR)}.batch_measure')
+
+POLYGON = 'POLYGON((-47.9 -15.8, -47.85 -15.8, -47.85 -15.75, -47.9 -15.75, -47.9 -15.8))'
+
+
+@pytest.fixture(scope='module')
+def qgis_app():
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QgsApplication([], False)
+    app.initQgis()
+    yield app
+    app.exitQgis()
+
+
+def features():
+    polygon = QgsFeature(1)
+    polygon.setGeometry(QgsGeometry.fromWkt(POLYGON))
+    # Feição sem geometria (NULL), comum em camadas com dados incompletos
+    null = QgsFeature(2)
+    return [polygon, null]
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+@pytest.mark.parametrize('stream_vertices', [0, 3])
+def test_chunk_with_null_geometry(qgis_app, vectorized, stream_vertices):
+    if vectorized and not batch_measure.HAS_BATCH_SUPPORT:
+        pytest.skip('NumPy/pyproj are not installed')
+
+    engine = measure_engine.MeasureEngine(
+        QgsCoordinateReferenceSystem('EPSG:4674'),
+        QgsWkbTypes.PolygonGeometry,
+        vectorized=vectorized,
+        stream_vertices=stream_vertices
+    )
+    engine.measure_chunk(features())
+
+    # A feição sem geometria é ignorada, sem interromper o bloco
+    results = engine.results
+    assert list(results.fids) == [1]
+    assert results.area[0] > 0
+    assert results.crs_at(0) == 'EPSG:32723'
+
+
+def test_measure_feature_skips_null_geometry(qgis_app):
+    engine = measure_engine.MeasureEngine(
+        QgsCoordinateReferenceSystem('EPSG:4674'), QgsWkbTypes.PolygonGeometry, stream_vertices=3
+    )
+    for feat in features():
+        engine.measure_feature(feat)
+    assert list(engine.results.fids) == [1]
+
+
+def test_is_large_on_null_geometry(qgis_app):
+    engine = measure_engine.MeasureEngine(
+        QgsCoordinateReferenceSystem('EPSG:4674'), QgsWkbTypes.PolygonGeometry, stream_vertices=3
+    )
+    assert not engine.is_large(QgsGeometry())
+    assert engine.is_large(QgsGeometry.fromWkt(POLYGON))
@@ -0,0 +1,91 @@
+"""
+Runs the SpatiaLite pushdown SQL on a local SpatiaLite file and checks it
+against the vectorised engine (target CRS, area and length).
+
+Needs the qgis module and an sqlite3 that can load mod_spatialite, as in the
+Python that ships with QGIS; skipped otherwise.
+"""
+import importlib
+import os
+import sqlite3
+import sys
+
+import pytest
+
+pytest.importorskip('qgis.core')
+pytest.importorskip('numpy')
+pytest.importorskip('pyproj')
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+
+pushdown_measure = importlib.import_module(f'{os.path.basename(PLUGIN_DIR)}.pushdown_measure')
+batch_measure = importlib.import_module(f'{os.path.basename(PLUGIN_DIR)}.batch_measure')
+
+# Uma feição pequena, uma logo abaixo e outra logo acima do limite de 5.9°, e uma no hemisfério norte
+POLYGONS = [
+    'POLYGON((-47.9 -15.8, -47.85 -15.8, -47.85 -15.75, -47.9 -15.75, -47.9 -15.8))',
+    'POLYGON((-55 -10, -49.2 -10, -49.2 -9, -55 -9, -55 -10))',
+    'POLYGON((-55 -10, -49 -10, -49 -9, -55 -9, -55 -10))',
+    'POLYGON((-43.3 0.5, -43.1 0.5, -43.1 0.8, -43.3 0.8, -43.3 0.5))',
+]
+
+
+def spatialite_connection(path):
+    conn = sqlite3.connect(path)
+    if not hasattr(conn, 'enable_load_extension'):
+        conn.close()
+        pytest.skip('sqlite3 cannot load extensions')
+    try:
+        conn.enable_load_extension(True)
+        conn.load_extension('mod_spatialite')
+    except sqlite3.OperationalError:
+        conn.close()
+        pytest.skip('mod_spatialite is not available')
+    return conn
+
+
+@pytest.fixture
+def spatialite_file(tmp_path):
+    path = str(tmp_path / 'parcels.sqlite')
+    conn = spatialite_connection(path)
+    conn.execute('SELECT InitSpatialMetadata(1)')
+    conn.execute('CREATE TABLE parcels (id INTEGER PRIMARY KEY)')
+    conn.execute("SELECT AddGeometryColumn('parcels', 'geom', 4674, 'POLYGON', 'XY')")
+    conn.executemany(
+        'INSERT INTO parcels (id, geom) VALUES (?, GeomFromText(?, 4674))',
+        [(idx + 1, text) for idx, text in enumerate(POLYGONS)]
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_spatialite_rows_match_batch_engine(spatialite_file):
+    pushdown = pushdown_measure.SpatialitePushdown(
+        True, True, spatialite_file, 'parcels', 'geom', 'id', 4674, False
+    )
+    rows = {fid: (target, area, length) for fid, target, area, length in pushdown.rows([1, 2, 3, 4])}
+
+    conn = spatialite_connection(spatialite_file)
+    wkbs = [bytes(row[0]) for row in conn.execute('SELECT AsBinary(geom) FROM parcels ORDER BY id')]
+    conn.close()
+    area, length, targets = batch_measure.BatchMeasurer().measure_auto('EPSG:4674', wkbs)
+
+    assert sorted(rows) == [1, 2, 3, 4]
+    for fid, expected in enumerate(targets, start=1):
+        target, measured_area, measured_length = rows[fid]
+        if expected == batch_measure.CONIC_CRS:
+            # A Policônica fica com o caminho do Python
+            assert target is None
+            continue
+        assert f'EPSG:{target}' == expected
+        assert measured_area == pytest.approx(area[fid - 1], rel=1e-9)
+        assert measured_length == pytest.approx(length[fid - 1], rel=1e-9)
+
+
+def test_spatialite_rows_skip_unselected_features(spatialite_file):
+    pushdown = pushdown_measure.SpatialitePushdown(
+        False, True, spatialite_file, 'parcels', 'geom', 'id', 4674, False
+    )
+    assert [row[0] for row in pushdown.rows([4])] == [4]